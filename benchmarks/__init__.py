@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of django-juice views, mixins, forms and HTTP utilities.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare results.json
+"""
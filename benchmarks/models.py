@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from django.db import models
+
+
+class Entry(models.Model):
+    title = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100)
+    body = models.TextField(max_length=1000)
+    rating = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'benchmarks'
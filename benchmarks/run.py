@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark runner.
+
+Every benchmark measures the time of one operation (a request to a view, an
+encoding of a payload, a form validation) with `RequestFactory` and
+in-memory SQLite. The results are printed and can be written to a JSON file
+and compared with the results of another run (e.g. of the previous commit):
+
+    python -m benchmarks.run --output before.json
+    # ... make changes ...
+    python -m benchmarks.run --compare before.json --threshold 0.1
+
+With `--compare` the runner exits with status 1 if some benchmark became
+slower by more than `--threshold` (a fraction, 0.1 by default).
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django
+django.setup()
+
+from django import forms
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.views.generic import DetailView
+from django.views.generic import View
+
+from juice.compat import with_metaclass
+from juice.forms import TrimCharFieldsModelFormMetaclass
+from juice.http import JsonResponse
+from juice.serializers import ValuesSerializer
+from juice.views.generic import AjaxActionView
+from juice.views.generic import ConfirmationView
+from juice.views.generic import GetParamsExtractionMixin
+from juice.views.generic import PostParamsExtractionMixin
+from juice.views.mixins import GetObjectOnceMixin
+from juice.views.mixins import UrlKwargsMixing
+
+from benchmarks.models import Entry
+
+BENCHMARKS = []
+
+factory = RequestFactory()
+
+
+def benchmark(name):
+    """
+    Register a benchmark. The decorated function performs the setup and
+    returns a function of one operation to time.
+    """
+    def decorator(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return decorator
+
+
+def ajax_post(data):
+    return factory.post('/', data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+
+class PlainView(View):
+    def get(self, request, *args, **kwargs):
+        return HttpResponse()
+
+    def post(self, request, *args, **kwargs):
+        return HttpResponse()
+
+
+@benchmark('view.plain')
+def bench_plain_view():
+    view = PlainView.as_view()
+    request = factory.get('/')
+    return lambda: view(request, pk='1', slug='x')
+
+
+class UrlKwargsView(UrlKwargsMixing, PlainView):
+    url_kwargs = ['pk', ('slug', '_entry_slug')]
+
+
+@benchmark('mixin.url_kwargs')
+def bench_url_kwargs():
+    view = UrlKwargsView.as_view()
+    request = factory.get('/')
+    return lambda: view(request, pk='1', slug='x')
+
+
+class GetParamsView(GetParamsExtractionMixin, PlainView):
+    get_parameters = ['q', ('page', 'int'), ('desc', 'bool')]
+
+
+@benchmark('mixin.get_params')
+def bench_get_params():
+    view = GetParamsView.as_view()
+    request = factory.get('/', {'q': 'juice', 'page': '3', 'desc': 'true'})
+    return lambda: view(request)
+
+
+class PostParamsView(PostParamsExtractionMixin, PlainView):
+    post_parameters = ['title', ('rating', 'int'), ('public', 'bool')]
+
+
+@benchmark('mixin.post_params')
+def bench_post_params():
+    view = PostParamsView.as_view()
+    request = factory.post('/', {'title': 'x', 'rating': '5',
+                                 'public': 'false'})
+    return lambda: view(request)
+
+
+class EntryView(GetObjectOnceMixin, DetailView):
+    model = Entry
+    template_name = 'entry.html'
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # The second call must not hit the database.
+        self.get_object()
+        return HttpResponse(self.object.title)
+
+
+@benchmark('mixin.get_object_once')
+def bench_get_object_once():
+    view = EntryView.as_view()
+    request = factory.get('/')
+    pk = Entry.objects.first().pk
+    return lambda: view(request, pk=pk)
+
+
+class RateView(AjaxActionView):
+    post_parameters = [('entry_id', 'int'), ('rating', 'int')]
+
+    def action(self, request):
+        return JsonResponse({'entry': self._entry_id, 'rating': self._rating})
+
+
+@benchmark('view.ajax_action')
+def bench_ajax_action():
+    view = RateView.as_view()
+    request = ajax_post({'entry_id': '1', 'rating': '5'})
+    return lambda: view(request)
+
+
+class ConfirmDeleteView(ConfirmationView):
+    template_name = 'confirm.html'
+    url_kwargs = ['pk']
+
+    def action(self, request):
+        pass
+
+
+@benchmark('view.confirmation.get')
+def bench_confirmation_get():
+    view = ConfirmDeleteView.as_view()
+    request = factory.get('/', {'back': '/entries/', 'success': '/done/'})
+    return lambda: view(request, pk='1').render()
+
+
+@benchmark('view.confirmation.post')
+def bench_confirmation_post():
+    view = ConfirmDeleteView.as_view()
+    request = factory.post('/', {'back': '/entries/', 'success': '/done/',
+                                 '_confirm': 'yes'})
+    return lambda: view(request, pk='1')
+
+
+def _payload(size):
+    return {'entries': [{'id': i, 'title': 'Entry {}'.format(i),
+                         'rating': i % 5, 'public': bool(i % 2)}
+                        for i in range(size)]}
+
+
+for _size in (10, 1000, 10000):
+    def _bench_json(size=_size):
+        payload = _payload(size)
+        return lambda: JsonResponse(payload)
+    benchmark('http.json_response.{}'.format(_size))(_bench_json)
+
+
+@benchmark('http.json_response.gzip')
+def bench_json_gzip():
+    payload = _payload(1000)
+    request = factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+    return lambda: JsonResponse(payload, request=request)
+
+
+@benchmark('serializer.instances.100')
+def bench_serialize_instances():
+    queryset = Entry.objects.all()[:100]
+    return lambda: JsonResponse({'results': [
+        {'id': e.pk, 'title': e.title, 'rating': e.rating}
+        for e in queryset.all()]})
+
+
+@benchmark('serializer.values_list.100')
+def bench_serialize_values_list():
+    serializer = ValuesSerializer(Entry, ['id', 'title', 'rating'])
+    queryset = Entry.objects.all()[:100]
+    return lambda: serializer.json_response(queryset.all())
+
+
+class EntryForm(with_metaclass(TrimCharFieldsModelFormMetaclass,
+                               forms.ModelForm)):
+    class Meta:
+        model = Entry
+        fields = ('title', 'slug', 'body', 'rating')
+        trim_fields = ('title', 'body')
+
+
+@benchmark('forms.trim_model_form')
+def bench_trim_form():
+    data = {'title': 'x' * 150, 'slug': 'entry', 'body': 'y' * 2000,
+            'rating': '3'}
+
+    def validate():
+        form = EntryForm(data)
+        assert form.is_valid(), form.errors
+    return validate
+
+
+def measure(func, repeat):
+    """
+    Return the best time of one call of `func` in seconds.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the comparison with `baseline` results and return the names of
+    benchmarks which became slower by more than `threshold`.
+    """
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = (seconds - before) / before
+        mark = ''
+        if change > threshold:
+            mark = '  REGRESSION'
+            regressions.append(name)
+        print('{:<32} {:>10.2f} us -> {:>10.2f} us {:>+7.1%}{}'.format(
+            name, before * 1e6, seconds * 1e6, change, mark))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-k', '--filter', default=None,
+                        help="Run only benchmarks matching the regexp.")
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help="Number of measurements to take the best of.")
+    parser.add_argument('-o', '--output', default=None,
+                        help="Write the results to a JSON file.")
+    parser.add_argument('-c', '--compare', default=None,
+                        help="Compare with the results in a JSON file.")
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                        help="Allowed slowdown when comparing.")
+    args = parser.parse_args(argv)
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    Entry.objects.bulk_create([
+        Entry(title='Entry {}'.format(i), slug='entry-{}'.format(i),
+              body='Body', rating=i % 5)
+        for i in range(100)])
+
+    results = {}
+    for name, setup in BENCHMARKS:
+        if args.filter and not re.search(args.filter, name):
+            continue
+        results[name] = measure(setup(), args.repeat)
+        print('{:<32} {:>10.2f} us'.format(name, results[name] * 1e6))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        print()
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
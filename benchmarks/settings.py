@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal Django settings for the benchmarks (in-memory SQLite, locmem
+templates).
+"""
+
+SECRET_KEY = 'benchmarks'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+ROOT_URLCONF = 'benchmarks.urls'
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'django.contrib.auth',
+    'juice',
+    'benchmarks',
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': [('django.template.loaders.locmem.Loader', {
+            'confirm.html': (
+                '<form method="post" action="">{{ form }}'
+                '<button name="{{ form_name }}" value="{{ no_btn_value }}">'
+                'No</button>'
+                '<button name="{{ form_name }}" value="{{ yes_btn_value }}">'
+                'Yes</button></form>'),
+            'entry.html': '<h1>{{ object.title }}</h1>{{ object.body }}',
+        })],
+    },
+}]
+
+USE_TZ = True
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Authentication utilities.
+
+`SessionUserCache` - a short-lived in-process cache of session key to user id
+mappings which lets login checks skip the session load and the user query.
+
+`CachedUser` - a lightweight user proxy which knows only the user id and
+loads the full user on access to other attributes.
+
+`is_authenticated` - checks if a user is authenticated on any Django version.
+"""
+from __future__ import unicode_literals
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+
+def is_authenticated(user):
+    """
+    Return whether `user` is authenticated. `is_authenticated` is a method
+    in Django <1.10 and a property in later versions.
+    """
+    authenticated = user.is_authenticated
+    if callable(authenticated):
+        authenticated = authenticated()
+    return bool(authenticated)
+
+
+class _CallableBool(object):
+    """
+    A boolean which can also be called, so both `user.is_authenticated` and
+    `user.is_authenticated()` work.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __bool__(self):
+        return self.value
+
+    __nonzero__ = __bool__
+
+    def __call__(self):
+        return self.value
+
+    def __eq__(self, other):
+        return self.value == other
+
+    def __ne__(self, other):
+        return self.value != other
+
+    def __hash__(self):
+        return hash(self.value)
+
+
+class CachedUser(object):
+    """
+    A stand-in for `request.user` of an authenticated user known only by id.
+
+    `pk`, `id`, `is_authenticated` and `is_anonymous` don't touch the
+    database; any other attribute loads the user with
+    `django.contrib.auth.get_user(request)` (once) and is taken from it.
+    `__class__` is taken from the loaded user too (like `SimpleLazyObject`
+    does), so `isinstance(request.user, User)` holds and the object can be
+    assigned to a foreign key.
+    """
+
+    is_authenticated = _CallableBool(True)
+    is_anonymous = _CallableBool(False)
+
+    def __init__(self, user_id, request):
+        self.pk = self.id = user_id
+        self._request = request
+        self._user = None
+
+    def _load(self):
+        if self._user is None:
+            self._user = auth.get_user(self._request)
+        return self._user
+
+    @property
+    def __class__(self):
+        return self._load().__class__
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __eq__(self, other):
+        return self._load() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return str(self._load())
+
+
+class SessionUserCache(object):
+    """
+    An in-process LRU of at most `max_size` session key -> user id mappings
+    which live for `ttl` seconds.
+
+    `prime(request)` replaces the lazy `request.user` with `CachedUser` if
+    the session key is in the cache, so the session isn't loaded and the
+    user isn't queried. Otherwise it evaluates `request.user` and caches
+    the id of an authenticated user. Anonymous users aren't cached.
+
+    Entries of a session are dropped on `user_logged_in` and
+    `user_logged_out` signals, entries of a user are dropped when the user
+    is saved (e.g. on password change) or deleted. Other processes' entries
+    live until their TTL expires, so keep `ttl` short.
+
+    Counters `hits` and `misses` are available as attributes and as a
+    dictionary returned by `stats`.
+    """
+
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._connected = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Return a dictionary with the cache counters.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def prime(self, request):
+        session = getattr(request, 'session', None)
+        session_key = session.session_key if session is not None else None
+        if session_key is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.hits += 1
+                    request.user = CachedUser(entry[1], request)
+                    return
+                self._drop(session_key)
+            self.misses += 1
+
+        self._connect()
+        user = request.user
+        if not is_authenticated(user):
+            return
+        with self._lock:
+            self._entries[session_key] = (now + self.ttl, user.pk)
+            self._keys_by_user.setdefault(user.pk, set()).add(session_key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_session(self, session_key):
+        with self._lock:
+            if session_key in self._entries:
+                self._drop(session_key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for session_key in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop(session_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _drop(self, session_key):
+        # Must be called with the lock held.
+        expires, user_id = self._entries.pop(session_key)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(session_key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def _connect(self):
+        if self._connected:
+            return
+        uid = 'juice.auth.{}'.format(id(self))
+        user_logged_in.connect(self._on_login_or_logout, weak=False,
+                               dispatch_uid=uid)
+        user_logged_out.connect(self._on_login_or_logout, weak=False,
+                                dispatch_uid=uid)
+        user_model = auth.get_user_model()
+        post_save.connect(self._on_user_change, sender=user_model,
+                          weak=False, dispatch_uid=uid)
+        post_delete.connect(self._on_user_change, sender=user_model,
+                            weak=False, dispatch_uid=uid)
+        self._connected = True
+
+    def _on_login_or_logout(self, sender, request, **kwargs):
+        if request is None:
+            return
+        # The session key has already been cycled (or flushed) when the
+        # signals are sent, so the key the client came with is taken from
+        # the cookie.
+        session_keys = set()
+        session = getattr(request, 'session', None)
+        if session is not None and session.session_key is not None:
+            session_keys.add(session.session_key)
+        cookie_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if cookie_key:
+            session_keys.add(cookie_key)
+        for session_key in session_keys:
+            self.invalidate_session(session_key)
+
+    def _on_user_change(self, sender, instance, **kwargs):
+        self.invalidate_user(instance.pk)
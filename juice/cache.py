@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Caching utilities.
+
+`ObjectCache` - a cross-request cache of model instances with a bounded
+in-process LRU tier, an optional Django cache backend tier and automatic
+invalidation on `post_save` and `post_delete` signals.
+"""
+from __future__ import unicode_literals
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+from . import compat
+
+
+class ObjectCache(object):
+    """
+    A cache of model instances keyed by model and lookup kwargs
+    (e.g. `{'pk': 5}` or `{'slug': 'foo'}`).
+
+    The first tier is an in-process LRU of at most `max_size` entries which
+    live for `ttl` seconds. The optional second tier is a Django cache
+    (`backend` is an alias from `CACHES` setting) with `backend_timeout`.
+
+    When an instance of a model is cached the first time, the cache connects
+    to `post_save` and `post_delete` signals of the model. On a signal all
+    in-process entries of the instance are dropped and the generation of the
+    model in the backend tier is incremented, which invalidates all backend
+    entries of the model in all processes. (Other processes' in-process
+    entries live until their TTL expires, so keep `ttl` short.)
+
+    Cached instances are never returned directly: the caller gets a shallow
+    copy, so the cache can't be spoiled by modifications made in a view.
+
+    Counters `hits`, `backend_hits`, `misses` and `invalidations` are
+    available as attributes and as a dictionary returned by `stats`.
+
+    Example:
+
+        entry_cache = ObjectCache(max_size=500, ttl=30, backend='default')
+
+        class EntryView(GetObjectOnceMixin, DetailView):
+            model = Entry
+            object_cache = entry_cache
+    """
+
+    def __init__(self, max_size=1000, ttl=60, backend=None,
+                 backend_timeout=300, key_prefix='juice.objcache'):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.backend_timeout = backend_timeout
+        self.key_prefix = key_prefix
+
+        self._entries = OrderedDict()
+        # (model, pk) -> set of entry keys, used for invalidation.
+        self._keys_by_object = {}
+        self._connected_models = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def stats(self):
+        """
+        Return a dictionary with the cache counters.
+        """
+        return {
+            'hits': self.hits,
+            'backend_hits': self.backend_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'size': len(self._entries),
+        }
+
+    def get(self, model, lookups, load):
+        """
+        Return a copy of the instance of `model` found by `lookups`. In case
+        of miss `load` function is called to fetch it from the database.
+        Exceptions raised by `load` (e.g. `Http404`) aren't cached.
+        """
+        key = (model, tuple(sorted(lookups.items())))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    # Move the entry to the end of LRU order.
+                    self._entries[key] = self._entries.pop(key)
+                    self.hits += 1
+                    return copy.copy(entry[1])
+                self._drop(key)
+            # An invalidation during the load makes the loaded object stale.
+            invalidations = self.invalidations
+
+        self._connect(model)
+        obj, generation = self._backend_get(key)
+        if obj is not None:
+            self.backend_hits += 1
+        else:
+            self.misses += 1
+            obj = load()
+            self._backend_set(key, obj, generation)
+
+        with self._lock:
+            if invalidations != self.invalidations:
+                return copy.copy(obj)
+            self._entries[key] = (now + self.ttl, obj)
+            self._keys_by_object.setdefault((model, obj.pk), set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+        return copy.copy(obj)
+
+    def invalidate(self, model, pk):
+        """
+        Drop all entries of the instance of `model` with primary key `pk`.
+        """
+        with self._lock:
+            for key in self._keys_by_object.pop((model, pk), ()):
+                self._entries.pop(key, None)
+            self.invalidations += 1
+        if self.backend is not None:
+            gen_key = self._generation_key(model)
+            backend = caches[self.backend]
+            try:
+                backend.incr(gen_key)
+            except ValueError:
+                backend.set(gen_key, 1, None)
+
+    def clear(self):
+        """
+        Drop all in-process entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_object.clear()
+
+    def _drop(self, key):
+        # Must be called with the lock held.
+        expires, obj = self._entries.pop(key)
+        keys = self._keys_by_object.get((key[0], obj.pk))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_object[(key[0], obj.pk)]
+
+    def _connect(self, model):
+        if model in self._connected_models:
+            return
+        uid = 'juice.objcache.{}.{}'.format(id(self), model._meta.db_table)
+        post_save.connect(self._on_change, sender=model, weak=False,
+                          dispatch_uid=uid)
+        post_delete.connect(self._on_change, sender=model, weak=False,
+                            dispatch_uid=uid)
+        self._connected_models.add(model)
+
+    def _on_change(self, sender, instance, **kwargs):
+        self.invalidate(sender, instance.pk)
+
+    def _generation_key(self, model):
+        return '{}:gen:{}'.format(self.key_prefix, model._meta.db_table)
+
+    def _backend_key(self, key):
+        model, lookups = key
+        digest = hashlib.md5(
+            compat.text_type(lookups).encode('utf-8')).hexdigest()
+        return '{}:{}:{}'.format(self.key_prefix, model._meta.db_table,
+                                 digest)
+
+    def _backend_get(self, key):
+        """
+        Return the object from the backend tier (or `None`) and the current
+        generation of the model.
+        """
+        if self.backend is None:
+            return None, None
+        gen_key = self._generation_key(key[0])
+        obj_key = self._backend_key(key)
+        values = caches[self.backend].get_many([gen_key, obj_key])
+        generation = values.get(gen_key, 0)
+        value = values.get(obj_key)
+        if value is None or value[0] != generation:
+            return None, generation
+        return value[1], generation
+
+    def _backend_set(self, key, obj, generation):
+        if self.backend is None:
+            return
+        caches[self.backend].set(self._backend_key(key), (generation, obj),
+                                 self.backend_timeout)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Python 2 and 3 compatibility helpers (`django.utils.six` was removed in
+Django 3.0).
+"""
+from __future__ import unicode_literals
+import sys
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:  # pragma: no cover
+    import Queue as queue
+    string_types = (basestring,)  # noqa: F821
+    integer_types = (int, long)  # noqa: F821
+    text_type = unicode  # noqa: F821
+else:
+    import queue
+    string_types = (str,)
+    integer_types = (int,)
+    text_type = str
+
+
+def with_metaclass(meta, *bases):
+    """
+    Create a base class with a metaclass (works like `six.with_metaclass`:
+    the temporary class is replaced with the real one).
+    """
+    class metaclass(type):
+
+        def __new__(cls, name, this_bases, d):
+            return meta(name, bases, d)
+
+        @classmethod
+        def __prepare__(cls, name, this_bases):
+            return meta.__prepare__(name, bases)
+    return type.__new__(metaclass, str('temporary_class'), (), {})
+
+
+__all__ = ['PY2', 'queue', 'string_types', 'integer_types', 'text_type',
+           'with_metaclass']
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrency utilities.
+
+`Limiter` - a per-process limiter of the number of concurrently executing
+requests with a bounded queue.
+
+`FileLimiter` - a limiter shared by all processes on one host, based on
+`flock` of slot files in a directory.
+
+`get_limiter` - returns the limiter of a named group (creates it on the first
+call).
+
+`SingleFlight` - coalesces concurrent calls with the same key into one
+execution and keeps the results for a short time.
+"""
+from __future__ import unicode_literals
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+class Limiter(object):
+    """
+    Admits at most `limit` concurrent holders in the current process.
+
+    `acquire(timeout, max_queue)` returns a token to pass to `release` or
+    `None` if the request is shed: either there are already `max_queue`
+    waiting requests or no slot became free during `timeout` seconds.
+
+    Counters `admitted`, `queued` (admitted or shed after waiting) and `shed`
+    are available as attributes and as a dictionary returned by `stats`.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self._condition = threading.Condition(threading.Lock())
+
+    def stats(self):
+        """
+        Return a dictionary with the limiter counters.
+        """
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'shed': self.shed,
+        }
+
+    def acquire(self, timeout=0, max_queue=None):
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if not self._can_wait(timeout, max_queue):
+                return None
+
+            deadline = time.time() + timeout
+            self.waiting += 1
+            self.queued += 1
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return None
+                    self._condition.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self, token):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def _can_wait(self, timeout, max_queue):
+        # Must be called with the lock held.
+        if timeout <= 0 or (max_queue is not None and
+                            self.waiting >= max_queue):
+            self.shed += 1
+            return False
+        return True
+
+
+class FileLimiter(Limiter):
+    """
+    Admits at most `limit` concurrent holders among all processes which use
+    the same `path` prefix (e.g. all workers of a server on one host).
+
+    Every slot is a file `<path>.<n>.lock` held with an exclusive `flock`;
+    the lock is released by the OS if the process dies. Waiting requests
+    poll the slots every `poll_interval` seconds. The counters and
+    `max_queue` are per process.
+    """
+
+    poll_interval = 0.01
+
+    def __init__(self, limit, path):
+        if fcntl is None:
+            raise ImproperlyConfigured(
+                "Cross-process concurrency limit requires 'fcntl' module.")
+        super(FileLimiter, self).__init__(limit)
+        self.paths = ['{}.{}.lock'.format(path, i) for i in range(limit)]
+
+    def acquire(self, timeout=0, max_queue=None):
+        fd = self._lock_slot()
+        with self._condition:
+            if fd is not None:
+                self.active += 1
+                self.admitted += 1
+                return fd
+            if not self._can_wait(timeout, max_queue):
+                return None
+            self.waiting += 1
+            self.queued += 1
+
+        deadline = time.time() + timeout
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    with self._condition:
+                        self.shed += 1
+                    return None
+                time.sleep(min(self.poll_interval, remaining))
+                fd = self._lock_slot()
+                if fd is not None:
+                    with self._condition:
+                        self.active += 1
+                        self.admitted += 1
+                    return fd
+        finally:
+            with self._condition:
+                self.waiting -= 1
+
+    def release(self, token):
+        # Closing the descriptor releases the lock.
+        os.close(token)
+        with self._condition:
+            self.active -= 1
+
+    def _lock_slot(self):
+        """
+        Lock the first free slot and return its descriptor or `None`.
+        """
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(group, limit, lock_dir=None):
+    """
+    Return the limiter of `group`. The limiter is created on the first call,
+    a `FileLimiter` with slot files in `lock_dir` if it's given. Raise
+    `ImproperlyConfigured` if the group already has a different limit.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(group)
+        if limiter is None:
+            if lock_dir is not None:
+                limiter = FileLimiter(limit, os.path.join(lock_dir, group))
+            else:
+                limiter = Limiter(limit)
+            _limiters[group] = limiter
+        elif limiter.limit != limit:
+            raise ImproperlyConfigured(
+                "Concurrency group '{}' already has limit {}."
+                .format(group, limiter.limit))
+        return limiter
+
+
+def get_stats():
+    """
+    Return the counters of all limiters as a dictionary `{group: stats}`.
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return dict((group, limiter.stats()) for group, limiter in limiters)
+
+
+class CoalescingTimeout(Exception):
+    pass
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'ok')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.ok = False
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key in the current process: the
+    first call executes the function, the calls which come while it's in
+    flight wait for it and get the same result.
+
+    If `ttl` is greater than 0 the results are also kept for `ttl` seconds
+    (at most `max_size` of them) and returned to later calls with the same
+    key.
+
+    Counters `executed`, `coalesced` (got the result of a call in flight) and
+    `cached` (got a kept result) are available as attributes and as a
+    dictionary returned by `stats`.
+    """
+
+    def __init__(self, ttl=0, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.executed = 0
+        self.coalesced = 0
+        self.cached = 0
+        self._calls = {}
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """
+        Return a dictionary with the counters.
+        """
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'cached': self.cached,
+            'in_flight': len(self._calls),
+        }
+
+    def do(self, key, func, timeout=None, cacheable=None):
+        """
+        Return the result of `func()` for `key` and the flag whether it's
+        shared with another call.
+
+        A waiting call raises `CoalescingTimeout` if the call in flight
+        doesn't finish in `timeout` seconds. If the call in flight raises an
+        exception, the waiting calls execute `func` on their own.
+        The result is kept only if `cacheable(result)` is true (or
+        `cacheable` is `None`).
+        """
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self.cached += 1
+                    return entry[1], True
+                del self._results[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise CoalescingTimeout
+            if call.ok:
+                return call.result, True
+            return func(), False
+
+        try:
+            result = func()
+        except BaseException:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+            raise
+
+        call.result = result
+        call.ok = True
+        with self._lock:
+            del self._calls[key]
+            self.executed += 1
+            if self.ttl > 0 and (cacheable is None or cacheable(result)):
+                self._results[key] = (time.time() + self.ttl, result)
+                while len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+        call.event.set()
+        return result, False
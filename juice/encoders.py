@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+JSON encoder backends.
+
+`StdlibJsonEncoder` - an encoder based on the standard `json` module which
+produces compact output.
+
+`OrjsonEncoder` - an encoder based on `orjson` package (if it's installed).
+
+`get_encoder` - returns the encoder configured by `JUICE_JSON_ENCODER` setting.
+
+`dumps` - encodes an object to JSON bytes with the configured encoder.
+
+`loads` - decodes JSON (with `orjson` if it's installed).
+"""
+from __future__ import unicode_literals
+import datetime
+import decimal
+import json
+import uuid
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import Promise
+
+from . import compat
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(obj):
+    """
+    Convert objects which aren't supported by JSON encoders natively:
+    `datetime`, `date`, `time`, `Decimal`, `UUID` and lazy translation
+    strings.
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return compat.text_type(obj)
+    if isinstance(obj, uuid.UUID):
+        return compat.text_type(obj)
+    if isinstance(obj, Promise):
+        return compat.text_type(obj)
+    raise TypeError("Object of type '{}' is not JSON serializable."
+                    .format(obj.__class__.__name__))
+
+
+class JsonEncoder(object):
+    """
+    A base class for JSON encoder backends.
+
+    A backend must implement `dumps` method which takes an object and returns
+    its UTF-8 encoded JSON representation as bytes.
+    """
+
+    def dumps(self, obj):
+        raise NotImplementedError
+
+
+class StdlibJsonEncoder(JsonEncoder):
+    """
+    An encoder based on the standard `json` module. It produces compact
+    output without whitespaces after separators.
+    """
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(separators=(',', ':'),
+                                         ensure_ascii=False,
+                                         default=default)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode('utf-8')
+
+
+class OrjsonEncoder(JsonEncoder):
+    """
+    An encoder based on `orjson` package which encodes straight to bytes.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured(
+                "OrjsonEncoder requires 'orjson' package to be installed.")
+        self._option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=default, option=self._option)
+
+
+_encoder = None
+
+
+def get_encoder():
+    """
+    Return the encoder instance configured by `JUICE_JSON_ENCODER` setting
+    (a dotted path to a `JsonEncoder` subclass).
+
+    If the setting isn't defined `OrjsonEncoder` is used when `orjson` is
+    installed and `StdlibJsonEncoder` otherwise.
+    """
+    global _encoder
+    if _encoder is None:
+        path = getattr(settings, 'JUICE_JSON_ENCODER', None)
+        if path is None:
+            encoder_class = (OrjsonEncoder if orjson is not None
+                             else StdlibJsonEncoder)
+        else:
+            module_name, _, class_name = path.rpartition('.')
+            try:
+                encoder_class = getattr(import_module(module_name),
+                                        class_name)
+            except (ImportError, AttributeError, ValueError):
+                raise ImproperlyConfigured(
+                    "Can't import JSON encoder '{}'.".format(path))
+        _encoder = encoder_class()
+    return _encoder
+
+
+def dumps(obj):
+    """
+    Encode `obj` to JSON bytes with the configured encoder.
+    """
+    return get_encoder().dumps(obj)
+
+
+def loads(data):
+    """
+    Decode JSON `data` (bytes or string) with `orjson` if it's installed and
+    with the standard `json` module otherwise. Raise `ValueError` in case of
+    invalid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
@@ -4,9 +4,18 @@ Form utilities.
 
 `TrimCharField` - a char field which truncates it's value to max_length before
 validation.
+
+`TrimCharFieldsModelFormMetaclass` - a metaclass for ModelForm which replaces
+`CharField` with `TrimCharField` for fields listed in `Meta.trim_fields`.
+
+`BulkModelFormSaver` - validates many rows with one ModelForm instance and
+saves valid rows with chunked `bulk_create`/`bulk_update`.
 """
 from __future__ import unicode_literals
+from itertools import islice
 
+from django.db import IntegrityError
+from django.db import transaction
 from django.forms import CharField
 from django.forms import ModelForm
 from django.forms.models import ModelFormMetaclass
@@ -90,3 +99,165 @@ class TrimCharFieldsModelFormMetaclass(ModelFormMetaclass):
             new_class.base_fields[f] = trimField
 
         return new_class
+
+
+class BulkResult(object):
+    """
+    A result of `BulkModelFormSaver.save`.
+
+    `created` and `updated` - numbers of created and updated rows.
+    `errors` - a list of (row_index, errors) pairs, where errors is a
+    dictionary of field names (or `__all__`) to lists of messages.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+
+class BulkModelFormSaver(object):
+    """
+    Validates rows (dictionaries, e.g. from `csv.DictReader` or a JSON feed)
+    with a ModelForm class (typically created with
+    `TrimCharFieldsModelFormMetaclass`) and saves valid rows with chunked
+    `bulk_create` and `bulk_update`.
+
+    Only one form instance is created: its fields (and `TrimCharField`
+    truncation) are reused for every row, only the data and the model
+    instance are replaced. Rows are consumed lazily chunk by chunk, so the
+    memory usage doesn't depend on the number of rows. Errors are collected
+    per row and never raised.
+
+    Parameters:
+        * `form_class` - a ModelForm class;
+        * `chunk_size` - the number of rows validated and saved at once;
+        * `key` - a name of a unique model field; if it's given rows whose
+          key matches an existing object update it (with `bulk_update` of
+          the form's fields) instead of creating a new one;
+        * `validate_unique` - run the form's per-row unique checks (one query
+          per row and unique constraint). By default they're skipped: if a
+          chunk violates a constraint it's saved row by row to find the
+          offending rows.
+
+    Note that `save` methods of the model and the form, signals and
+    many-to-many fields are not involved as with any bulk operation.
+
+    Example:
+
+        saver = BulkModelFormSaver(UserProfileForm, chunk_size=1000,
+                                   key='email')
+        result = saver.save(csv.DictReader(f))
+        # result.created, result.updated, result.errors
+    """
+
+    def __init__(self, form_class, chunk_size=500, key=None,
+                 validate_unique=False):
+        self.form_class = form_class
+        self.model = form_class._meta.model
+        self.chunk_size = chunk_size
+        self.key = key
+        self.validate_unique = validate_unique
+
+        self._form = form_class(data={})
+        if not validate_unique:
+            self._form.validate_unique = lambda: None
+        self._update_fields = [
+            f.name for f in self.model._meta.concrete_fields
+            if f.name in self._form.fields and not f.primary_key]
+
+    def clean(self, data):
+        """
+        Validate one row with the shared form instance. Return a model
+        instance with the cleaned values or the form errors.
+        """
+        form = self._form
+        form.data = data
+        form.is_bound = True
+        form._errors = None
+        form.instance = self.model()
+        # Drop values cached for the previous row.
+        form.__dict__.pop('changed_data', None)
+        form._bound_fields_cache = {}
+
+        form.full_clean()
+        if form._errors:
+            return None, dict((name, list(errors))
+                              for name, errors in form._errors.items())
+        return form.instance, None
+
+    def save(self, rows):
+        """
+        Validate and save `rows`. Return `BulkResult`.
+        """
+        result = BulkResult()
+        rows = iter(rows)
+        index = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            objects = []
+            for data in chunk:
+                obj, errors = self.clean(data)
+                if errors is None:
+                    objects.append((index, obj))
+                else:
+                    result.errors.append((index, errors))
+                index += 1
+            self._save_chunk(objects, result)
+        return result
+
+    def _save_chunk(self, objects, result):
+        to_create, to_update = self._split(objects)
+        try:
+            with transaction.atomic():
+                if to_create:
+                    self.model._default_manager.bulk_create(
+                        [obj for i, obj in to_create])
+                if to_update:
+                    self.model._default_manager.bulk_update(
+                        [obj for i, obj in to_update], self._update_fields)
+        except IntegrityError:
+            # Find the offending rows.
+            for i, obj in to_create:
+                if self._save_row(i, obj, result, force_insert=True):
+                    result.created += 1
+            for i, obj in to_update:
+                if self._save_row(i, obj, result,
+                                  update_fields=self._update_fields):
+                    result.updated += 1
+        else:
+            result.created += len(to_create)
+            result.updated += len(to_update)
+
+    def _save_row(self, index, obj, result, **kwargs):
+        try:
+            with transaction.atomic():
+                obj.save(**kwargs)
+        except IntegrityError as e:
+            result.errors.append((index, {'__all__': [str(e)]}))
+            return False
+        return True
+
+    def _split(self, objects):
+        """
+        Split the objects into ones to create and ones to update (if `key` is
+        set) and set primary keys of the latter.
+        """
+        if self.key is None:
+            return objects, []
+        keys = [getattr(obj, self.key) for i, obj in objects]
+        existing = self.model._default_manager.filter(
+            **{self.key + '__in': keys}).values_list(self.key, 'pk')
+        pks = dict(existing)
+        to_create, to_update = [], []
+        for i, obj in objects:
+            pk = pks.get(getattr(obj, self.key))
+            if pk is None:
+                to_create.append((i, obj))
+            else:
+                obj.pk = pk
+                obj._state.adding = False
+                to_update.append((i, obj))
+        return to_create, to_update
@@ -5,10 +5,110 @@ HTTP utilities.
 `JsonResponse` - a subclass of `HttpResponse` which converts dictionary passed
 to its constructor to JSON format and sets ContentType header to
 "application/json".
+
+`StreamingJsonResponse` - a subclass of `StreamingHttpResponse` which streams
+items of an iterable as a JSON array.
+
+`compress` - compresses a body with gzip or deflate.
 """
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from timeit import default_timer
 
+from django.conf import settings
 from django.http import HttpResponse
-from django.utils import simplejson
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import instrumentation
+from .encoders import get_encoder
+
+# zlib window bits for the supported content codings.
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def _accepted_coding(request):
+    """
+    Return the preferred content coding ('gzip' or 'deflate') accepted by
+    the client according to Accept-Encoding header or `None`.
+    """
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if not header:
+        return None
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    default = qualities.get('*', 0.0)
+    for coding in ('gzip', 'deflate'):
+        if qualities.get(coding, default) > 0:
+            return coding
+    return None
+
+
+class _CompressedCache(object):
+    """
+    An in-process LRU of compressed bodies keyed by a digest of the
+    uncompressed body, the coding and the level.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.pop(key, None)
+            if body is not None:
+                self._entries[key] = body
+            return body
+
+    def set(self, key, body, max_size):
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_compressed_cache = _CompressedCache()
+
+
+def compress(content, coding, level=6):
+    """
+    Compress `content` (bytes) with `coding` ('gzip' or 'deflate').
+
+    If `JUICE_JSON_COMPRESS_CACHE_SIZE` setting is greater than 0, that many
+    compressed bodies are kept in an in-process LRU, so identical hot bodies
+    are hashed instead of being compressed again.
+    """
+    cache_size = getattr(settings, 'JUICE_JSON_COMPRESS_CACHE_SIZE', 0)
+    if cache_size:
+        key = (hashlib.sha1(content).digest(), coding, level)
+        body = _compressed_cache.get(key)
+        if body is not None:
+            return body
+
+    # gzip header is written without a timestamp, so equal contents give
+    # equal bodies.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[coding])
+    body = compressor.compress(content) + compressor.flush()
+
+    if cache_size:
+        _compressed_cache.set(key, body, cache_size)
+    return body
 
 
 class JsonResponse(HttpResponse):
@@ -16,9 +116,107 @@ class JsonResponse(HttpResponse):
     A subclass of `HttpResponse` which converts dictionary passed to its
     constructor to JSON format and sets ContentType header to
     "application/json".
+
+    The dictionary is encoded straight to bytes by `encoder` (an instance of
+    `juice.encoders.JsonEncoder`) or by the encoder configured with
+    `JUICE_JSON_ENCODER` setting.
+    The original dictionary is available as `data` attribute.
+
+    If `request` is passed, the body is compressed with gzip or deflate
+    according to its Accept-Encoding header (and `Vary: Accept-Encoding` is
+    set), so the whole site doesn't need `GZipMiddleware`. Bodies shorter
+    than `compress_min_size` bytes (`JUICE_JSON_COMPRESS_MIN_SIZE` setting,
+    1024 by default) aren't compressed. `compress_level` is the zlib level
+    (`JUICE_JSON_COMPRESS_LEVEL` setting, 6 by default). See `compress` for
+    the caching of compressed bodies.
     """
 
-    def __init__(self, dictionary):
+    def __init__(self, dictionary, encoder=None, request=None,
+                 compress_min_size=None, compress_level=None):
+        if encoder is None:
+            encoder = get_encoder()
+        active = instrumentation.active_view() is not None
+        if not active:
+            content = encoder.dumps(dictionary)
+        else:
+            start = default_timer()
+            content = encoder.dumps(dictionary)
+            instrumentation.record('encode', default_timer() - start)
+
+        coding = None
+        if request is not None:
+            if compress_min_size is None:
+                compress_min_size = getattr(
+                    settings, 'JUICE_JSON_COMPRESS_MIN_SIZE', 1024)
+            if len(content) >= compress_min_size:
+                coding = _accepted_coding(request)
+        if coding is not None:
+            if compress_level is None:
+                compress_level = getattr(settings,
+                                         'JUICE_JSON_COMPRESS_LEVEL', 6)
+            start = default_timer()
+            compressed = compress(content, coding, compress_level)
+            if active:
+                instrumentation.record('compress', default_timer() - start)
+            if len(compressed) < len(content):
+                content = compressed
+            else:
+                coding = None
+
         super(JsonResponse, self).__init__(
-            simplejson.dumps(dictionary),
+            content,
+            content_type='application/json')
+        self.data = dictionary
+        if request is not None:
+            patch_vary_headers(self, ('Accept-Encoding',))
+        if coding is not None:
+            self['Content-Encoding'] = coding
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    A subclass of `StreamingHttpResponse` which encodes items of an iterable
+    (a list, a generator, `QuerySet.iterator()` etc.) one by one and streams
+    them as a JSON array with ContentType header set to "application/json".
+
+    Items are consumed lazily, so the whole result is never held in memory.
+    Encoded items are buffered into chunks of about `chunk_size` bytes
+    to avoid writing many tiny pieces to the socket. Items are encoded by
+    `encoder` or by the encoder configured with `JUICE_JSON_ENCODER` setting.
+
+    Example:
+
+        def get(self, request, *args, **kwargs):
+            rows = Entry.objects.values('id', 'title').iterator()
+            return StreamingJsonResponse(rows)
+    """
+
+    chunk_size = 16 * 1024
+
+    def __init__(self, iterable, chunk_size=None, encoder=None):
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        if encoder is None:
+            encoder = get_encoder()
+        super(StreamingJsonResponse, self).__init__(
+            self._encode(iterable, encoder),
             content_type='application/json')
+
+    def _encode(self, iterable, encoder):
+        chunk_size = self.chunk_size
+        dumps = encoder.dumps
+        buf = [b'[']
+        buf_len = 1
+        separator = b''
+        for item in iterable:
+            encoded = dumps(item)
+            buf.append(separator)
+            buf.append(encoded)
+            buf_len += len(encoded) + 1
+            separator = b','
+            if buf_len >= chunk_size:
+                yield b''.join(buf)
+                buf = []
+                buf_len = 0
+        buf.append(b']')
+        yield b''.join(buf)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Timing instrumentation of views.
+
+`Histogram` - a low-overhead histogram of durations with log-scale buckets.
+
+`record` - records a duration of a phase of the view being dispatched in the
+current thread (used by `TimingMixin`, `JsonResponse` etc.)
+
+`get_stats` and `reset_stats` - access to the aggregated timings.
+
+The timings are aggregated per view class and phase in the current process.
+If `JUICE_TIMINGS_DIR` setting is defined each process periodically (every
+`JUICE_TIMINGS_FLUSH_INTERVAL` seconds, 10 by default) dumps its histograms
+to a file in this directory and `get_stats` merges the files of all
+processes, so the stats are available with multiple worker processes.
+"""
+from __future__ import unicode_literals
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+# Upper bounds of the buckets: 1us, 2us, 4us ... ~67s, the last bucket is
+# for everything longer.
+BUCKET_BOUNDS = tuple(0.000001 * 2 ** i for i in range(27))
+
+_local = threading.local()
+
+
+class Histogram(object):
+    """
+    A histogram of durations (in seconds) with fixed log-scale buckets.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        """
+        Return the upper bound of the bucket the `fraction` (0..1) of the
+        durations falls into.
+        """
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                if i < len(BUCKET_BOUNDS):
+                    return min(BUCKET_BOUNDS[i], self.max)
+                return self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+    def to_dict(self):
+        return {'counts': self.counts, 'count': self.count,
+                'total': self.total, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.max = data['max']
+        return histogram
+
+
+class _Registry(object):
+    """
+    Histograms of the current process keyed by (view, phase).
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.next_flush = 0.0
+        self.reset_at = time.time()
+
+    def add(self, view, phase, seconds):
+        key = (view, phase)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(seconds)
+        if time.time() >= self.next_flush:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return dict((key, Histogram.from_dict(h.to_dict()))
+                        for key, h in self.histograms.items())
+
+    def flush(self):
+        """
+        Dump the histograms to the process' file in `JUICE_TIMINGS_DIR`.
+        """
+        # Only one thread flushes, the others don't wait for it.
+        if not self.flush_lock.acquire(False):
+            return
+        try:
+            self._flush()
+        finally:
+            self.flush_lock.release()
+
+    def _flush(self):
+        directory = getattr(settings, 'JUICE_TIMINGS_DIR', None)
+        self.next_flush = time.time() + getattr(
+            settings, 'JUICE_TIMINGS_FLUSH_INTERVAL', 10)
+        if directory is None:
+            return
+
+        # Another process may have reset the stats.
+        reset_at = _read_reset_time(directory)
+        if reset_at > self.reset_at:
+            with self.lock:
+                self.histograms.clear()
+                self.reset_at = reset_at
+
+        data = [[view, phase, h.to_dict()]
+                for (view, phase), h in self.snapshot().items()]
+        if not data:
+            return
+        path = os.path.join(directory, '{}.json'.format(os.getpid()))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, path)
+
+
+_registry = _Registry()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _registry.histograms:
+        _registry.flush()
+
+
+def _read_reset_time(directory):
+    try:
+        with open(os.path.join(directory, 'reset')) as f:
+            return float(f.read())
+    except (IOError, OSError, ValueError):
+        return 0.0
+
+
+def activate(view):
+    """
+    Make `view` (a name of a view class) the current view of the thread.
+    """
+    _local.view = view
+
+
+def active_view():
+    """
+    Return the name of the view being dispatched in the current thread or
+    `None`.
+    """
+    return getattr(_local, 'view', None)
+
+
+def record(phase, seconds, view=None):
+    """
+    Record `seconds` spent in `phase` by `view` (by default the view being
+    dispatched in the current thread, nothing is recorded if there isn't
+    one).
+    """
+    if view is None:
+        view = getattr(_local, 'view', None)
+        if view is None:
+            return
+    _registry.add(view, phase, seconds)
+
+
+def get_stats():
+    """
+    Return the aggregated timings as a dictionary
+    `{view: {phase: {'count', 'mean', 'p50', 'p90', 'p99', 'max'}}}`
+    (durations are in seconds).
+    """
+    merged = {}
+
+    def merge(key, histogram):
+        if key in merged:
+            merged[key].merge(histogram)
+        else:
+            merged[key] = histogram
+
+    directory = getattr(settings, 'JUICE_TIMINGS_DIR', None)
+    if directory is not None:
+        _registry.flush()
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    data = json.load(f)
+            except (IOError, OSError, ValueError):
+                continue
+            for view, phase, histogram in data:
+                merge((view, phase), Histogram.from_dict(histogram))
+    else:
+        for key, histogram in _registry.snapshot().items():
+            merge(key, histogram)
+
+    stats = {}
+    for (view, phase), histogram in merged.items():
+        stats.setdefault(view, {})[phase] = histogram.summary()
+    return stats
+
+
+def reset_stats():
+    """
+    Reset the timings of the current process and, if `JUICE_TIMINGS_DIR` is
+    defined, of all processes.
+    """
+    now = time.time()
+    with _registry.lock:
+        _registry.histograms.clear()
+        _registry.reset_at = now
+
+    directory = getattr(settings, 'JUICE_TIMINGS_DIR', None)
+    if directory is None:
+        return
+    with open(os.path.join(directory, 'reset'), 'w') as f:
+        f.write(repr(now))
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Background jobs.
+
+`JobBackend` - the interface of job backends: submits functions for
+execution and keeps the status, progress and result of the jobs.
+
+`LocalJobBackend` - the default backend: an in-process queue served by a
+pool of worker threads.
+
+`get_backend` - returns the backend configured by `JUICE_JOBS_BACKEND`
+setting.
+"""
+from __future__ import unicode_literals
+import logging
+import threading
+import time
+import uuid
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+from .compat import queue
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobBackend(object):
+    """
+    The interface of job backends.
+
+    A job is described by a dictionary with keys `id`, `status` (one of
+    'pending', 'running', 'done' and 'failed'), `progress` (`None` or a
+    number from 0 to 1), `result` (a JSON-serializable value returned by the
+    job function), `error` and `owner` (an id of the user who submitted the
+    job or `None`).
+    """
+
+    def submit(self, func, owner=None):
+        """
+        Submit `func` for execution, it'll be called with the job id as the
+        only argument. Return the job id. Raise `JobQueueFull` if the backend
+        can't accept more jobs.
+        """
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """
+        Return the dictionary describing the job or `None` if it isn't
+        known.
+        """
+        raise NotImplementedError
+
+    def set_progress(self, job_id, progress):
+        """
+        Set the progress of a running job.
+        """
+        raise NotImplementedError
+
+
+class LocalJobBackend(JobBackend):
+    """
+    Executes jobs in `workers` threads of the current process. At most
+    `max_pending` jobs wait in the queue; finished jobs are kept for `keep`
+    seconds.
+
+    The jobs are lost if the process exits, so the backend suits actions
+    which are acceptable to lose (or are repeated by the user). The database
+    connections of a worker thread are closed after every job.
+    """
+
+    def __init__(self, workers=4, max_pending=1000, keep=60 * 60):
+        self.workers = workers
+        self.keep = keep
+        self._queue = queue.Queue(max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, func, owner=None):
+        self._start_workers()
+        job_id = uuid.uuid4().hex
+        job = {'id': job_id, 'status': PENDING, 'progress': None,
+               'result': None, 'error': None, 'owner': owner,
+               'finished': None}
+        with self._lock:
+            self._purge()
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, func))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise JobQueueFull
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def set_progress(self, job_id, progress):
+        self._update(job_id, progress=progress)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _purge(self):
+        # Must be called with the lock held.
+        deadline = time.time() - self.keep
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and
+                   job['finished'] < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _start_workers(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work,
+                                          name='juice-jobs')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id, func = self._queue.get()
+            self._update(job_id, status=RUNNING)
+            try:
+                result = func(job_id)
+            except Exception:
+                logger.exception("Job %s failed.", job_id)
+                self._update(job_id, status=FAILED, error="Job failed.",
+                             finished=time.time())
+            else:
+                self._update(job_id, status=DONE, result=result,
+                             progress=1, finished=time.time())
+            finally:
+                for connection in connections.all():
+                    connection.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return the backend instance configured by `JUICE_JOBS_BACKEND` setting
+    (a dotted path to a `JobBackend` subclass, `LocalJobBackend` by default).
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'JUICE_JOBS_BACKEND', None)
+                if path is None:
+                    backend_class = LocalJobBackend
+                else:
+                    module_name, _, class_name = path.rpartition('.')
+                    try:
+                        backend_class = getattr(import_module(module_name),
+                                                class_name)
+                    except (ImportError, AttributeError, ValueError):
+                        raise ImproperlyConfigured(
+                            "Can't import jobs backend '{}'.".format(path))
+                _backend = backend_class()
+    return _backend
+
+
+def get_owner(request):
+    """
+    Return the id of the user who made `request` or `None` for anonymous
+    users.
+    """
+    user = getattr(request, 'user', None)
+    if user is None:
+        return None
+    authenticated = user.is_authenticated
+    if callable(authenticated):
+        authenticated = authenticated()
+    return user.pk if authenticated else None
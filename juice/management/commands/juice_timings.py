@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+`juice_timings` - a management command which prints the timings collected by
+`TimingMixin`.
+"""
+from __future__ import unicode_literals
+import json
+
+from django.core.management.base import BaseCommand
+
+from juice.instrumentation import get_stats
+from juice.instrumentation import reset_stats
+
+
+class Command(BaseCommand):
+    help = ("Print per view timings collected by TimingMixin "
+            "(durations are in milliseconds).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', dest='json',
+                            help="Output the raw stats as JSON "
+                                 "(durations are in seconds).")
+        parser.add_argument('--reset', action='store_true', dest='reset',
+                            help="Reset the stats after printing them.")
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2, sort_keys=True))
+        else:
+            row = "{:<24} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}"
+            for view in sorted(stats):
+                self.stdout.write(view)
+                self.stdout.write(row.format('  phase', 'count', 'mean',
+                                             'p50', 'p90', 'p99', 'max'))
+                for phase in sorted(stats[view]):
+                    s = stats[view][phase]
+                    self.stdout.write(row.format(
+                        '  ' + phase, s['count'],
+                        *['{:.3f}'.format(s[k] * 1000) for k in
+                          ('mean', 'p50', 'p90', 'p99', 'max')]))
+
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+In-process publish/subscribe for pushing updates to async views (requires
+Python 3).
+
+`Hub` - the interface of hubs.
+
+`LocalHub` - the default hub which delivers messages to subscribers in the
+current process.
+
+`get_hub` - returns the hub configured by `JUICE_PUBSUB_HUB` setting.
+"""
+from __future__ import unicode_literals
+import asyncio
+import itertools
+import threading
+from collections import deque
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class Message(object):
+    """
+    A published message: a hub-wide increasing `id`, `channel` and `data`
+    (a JSON-serializable value).
+    """
+
+    __slots__ = ('id', 'channel', 'data')
+
+    def __init__(self, id, channel, data):
+        self.id = id
+        self.channel = channel
+        self.data = data
+
+
+class Subscription(object):
+    """
+    A subscription of a client to channels with a buffer of at most
+    `max_buffer` undelivered messages. If a slow client lets the buffer
+    overflow, the oldest messages are dropped and `overflowed` is set.
+
+    Subscriptions must be created and read in the event loop thread.
+    """
+
+    def __init__(self, channels, max_buffer):
+        self.channels = frozenset(channels)
+        self.buffer = deque(maxlen=max_buffer)
+        self.overflowed = False
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    def push(self, message):
+        """
+        Add the message to the buffer. Can be called from any thread.
+        """
+        self._loop.call_soon_threadsafe(self._push, message)
+
+    def _push(self, message):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.overflowed = True
+        self.buffer.append(message)
+        self._ready.set()
+
+    async def get(self, timeout):
+        """
+        Return the buffered messages, waiting at most `timeout` seconds for
+        the first one (an empty list on timeout).
+        """
+        if not self.buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        messages = list(self.buffer)
+        self.buffer.clear()
+        return messages
+
+
+class Hub(object):
+    """
+    The interface of hubs.
+    """
+
+    def publish(self, channel, data):
+        """
+        Publish `data` to the subscribers of `channel`. Can be called from
+        sync code in any thread.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, channels, max_buffer=100, after=None):
+        """
+        Return a `Subscription` to `channels`. If `after` (a message id) is
+        given, the retained messages published after it are delivered first.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class LocalHub(Hub):
+    """
+    Delivers messages to subscribers in the current process. The last
+    `history_size` messages of every channel are retained, so clients which
+    reconnect (long polling, SSE `Last-Event-ID`) don't miss them.
+
+    Messages published in other processes aren't delivered: publish them in
+    the process which serves the streams or implement a `Hub` on top of an
+    external broker.
+    """
+
+    def __init__(self, history_size=100):
+        self.history_size = history_size
+        self._ids = itertools.count(1)
+        self._subscriptions = {}
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, data):
+        with self._lock:
+            message = Message(next(self._ids), channel, data)
+            history = self._history.get(channel)
+            if history is None:
+                history = self._history[channel] = deque(
+                    maxlen=self.history_size)
+            history.append(message)
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.push(message)
+        return message
+
+    def subscribe(self, channels, max_buffer=100, after=None):
+        subscription = Subscription(channels, max_buffer)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(
+                    subscription)
+            if after is not None:
+                missed = [message
+                          for channel in subscription.channels
+                          for message in self._history.get(channel, ())
+                          if message.id > after]
+                for message in sorted(missed, key=lambda m: m.id):
+                    subscription._push(message)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscriptions = self._subscriptions.get(channel)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[channel]
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """
+    Return the hub instance configured by `JUICE_PUBSUB_HUB` setting (a
+    dotted path to a `Hub` subclass, `LocalHub` by default).
+    """
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                path = getattr(settings, 'JUICE_PUBSUB_HUB', None)
+                if path is None:
+                    hub_class = LocalHub
+                else:
+                    module_name, _, class_name = path.rpartition('.')
+                    try:
+                        hub_class = getattr(import_module(module_name),
+                                            class_name)
+                    except (ImportError, AttributeError, ValueError):
+                        raise ImproperlyConfigured(
+                            "Can't import pub/sub hub '{}'.".format(path))
+                _hub = hub_class()
+    return _hub
+
+
+def publish(channel, data):
+    """
+    Publish `data` to `channel` of the configured hub.
+    """
+    return get_hub().publish(channel, data)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Database query accounting.
+
+`QueryRecorder` - counts the queries executed while it's installed on
+database connections and detects repeated structurally identical queries
+(N+1 patterns) with their call sites.
+
+`fingerprint` - returns the structure of an SQL query without literal values.
+
+`QueryBudgetExceeded` and `QueryBudgetWarning` - raised and issued by
+`QueryBudgetMixin` when a view exceeds its budget and the budget action is
+'raise' or 'warn'.
+"""
+from __future__ import unicode_literals
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+import django
+from django.db import connections
+
+# Frames in these directories aren't reported as call sites.
+_IGNORED_DIRS = tuple(
+    os.path.dirname(os.path.abspath(path)) + os.sep
+    for path in (django.__file__, __file__))
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+# Transaction control statements (e.g. savepoints of nested atomic blocks)
+# aren't counted.
+_TRANSACTION_RE = re.compile(
+    r'\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK|BEGIN|COMMIT)\b', re.I)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetWarning(RuntimeWarning):
+    pass
+
+
+def fingerprint(sql):
+    """
+    Return `sql` with string and number literals and placeholders replaced
+    by `?` and lists of values (`IN (?, ?, ?)`) collapsed to `(...)`, so
+    queries which differ only in values have equal fingerprints.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _call_site():
+    """
+    Return 'path:line in function' of the innermost frame outside Django and
+    juice (the code which made the query) or `None`.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if not path.startswith(_IGNORED_DIRS):
+            return '{}:{} in {}'.format(path, frame.f_lineno,
+                                        frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder(object):
+    """
+    An `execute_wrapper` (Django >=2.0) which counts queries (except
+    transaction control statements like `SAVEPOINT`) and, for every
+    query fingerprint executed at least `duplicate_threshold` times,
+    remembers the call sites of the repeated executions (at most
+    `max_sites` distinct ones per fingerprint). With `duplicate_threshold`
+    set to `None` only the number of queries is recorded.
+
+    The call stack is inspected only for repeated queries, so a view without
+    duplicates pays for a fingerprint per query.
+
+    Example:
+
+        recorder = QueryRecorder()
+        with recorder.install():
+            list(Entry.objects.all())
+        recorder.count, recorder.duplicates()
+    """
+
+    def __init__(self, duplicate_threshold=2, max_sites=5):
+        self.duplicate_threshold = duplicate_threshold
+        self.max_sites = max_sites
+        self.count = 0
+        self.fingerprints = {}
+        self.sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if _TRANSACTION_RE.match(sql) is not None:
+            return execute(sql, params, many, context)
+        self.count += 1
+        if self.duplicate_threshold is None:
+            return execute(sql, params, many, context)
+        key = fingerprint(sql)
+        seen = self.fingerprints.get(key, 0) + 1
+        self.fingerprints[key] = seen
+        if seen >= self.duplicate_threshold:
+            sites = self.sites.setdefault(key, [])
+            if len(sites) < self.max_sites:
+                site = _call_site()
+                if site is not None and site not in sites:
+                    sites.append(site)
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def install(self, using=None):
+        """
+        A context manager which installs the recorder on the connections
+        with aliases `using` (all connections by default).
+        """
+        if using is None:
+            using = connections
+        installed = []
+        try:
+            for alias in using:
+                wrappers = connections[alias].execute_wrappers
+                wrappers.append(self)
+                installed.append(wrappers)
+            yield self
+        finally:
+            for wrappers in installed:
+                wrappers.remove(self)
+
+    def duplicates(self):
+        """
+        Return the list of `(fingerprint, count, call_sites)` of the queries
+        executed at least `duplicate_threshold` times, most repeated first.
+        """
+        if self.duplicate_threshold is None:
+            return []
+        result = [(key, count, list(self.sites.get(key, ())))
+                  for key, count in self.fingerprints.items()
+                  if count >= self.duplicate_threshold]
+        result.sort(key=lambda item: -item[1])
+        return result
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Serialization of querysets to JSON-ready dictionaries.
+
+`ValuesSerializer` - a serializer compiled once per model and field list
+which reads rows with `values_list`, without instantiating models.
+
+`get_serializer` - returns the (cached) serializer of a model and fields.
+"""
+from __future__ import unicode_literals
+import copy
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ImproperlyConfigured
+
+from . import compat
+from .http import JsonResponse
+from .http import StreamingJsonResponse
+
+
+def _check_path(model, path):
+    """
+    Check that `path` (a field name or a lookup across relations like
+    `author__name`) points to a field of `model`.
+    """
+    opts = model._meta
+    names = path.split('__')
+    for i, name in enumerate(names):
+        if name == 'pk':
+            field = opts.pk
+        else:
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    "Model '{}' has no field '{}' (in '{}')."
+                    .format(opts.object_name, name, path))
+        if i < len(names) - 1:
+            if field.related_model is None:
+                raise ImproperlyConfigured(
+                    "Field '{}' of model '{}' isn't a relation (in '{}')."
+                    .format(name, opts.object_name, path))
+            opts = field.related_model._meta
+
+
+def _split_fields(fields):
+    """
+    Return the tuples of keys and paths of `fields`.
+    """
+    keys = []
+    paths = []
+    for field in fields:
+        if isinstance(field, compat.string_types):
+            key = path = field
+        else:
+            key, path = field
+        keys.append(key)
+        paths.append(path)
+    return tuple(keys), tuple(paths)
+
+
+class ValuesSerializer(object):
+    """
+    Serializes querysets of `model` to dictionaries with `fields`.
+
+    An element of `fields` can be:
+        * a string with a field name or a lookup across forward relations
+          (e.g. `author__name`), which is also the key in the dictionary;
+        * a tuple in (key, path) format.
+
+    The fields are validated once, when the serializer is created. Rows are
+    read with `values_list`, so models aren't instantiated and the related
+    fields are fetched by the same query with JOINs (like with
+    `select_related`).
+
+    Example:
+
+        entry_serializer = ValuesSerializer(
+            Entry, ['id', 'title', ('author', 'author__username')])
+
+        def get(self, request, *args, **kwargs):
+            return entry_serializer.json_response(
+                Entry.objects.filter(public=True), request=request)
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.keys, self.paths = _split_fields(fields)
+        for path in self.paths:
+            _check_path(model, path)
+
+    def _rows(self, queryset):
+        if queryset.model is not self.model:
+            raise ValueError("The queryset isn't of model '{}'."
+                             .format(self.model._meta.object_name))
+        return queryset.values_list(*self.paths)
+
+    def serialize(self, queryset):
+        """
+        Return the list of dictionaries of the queryset's rows.
+        """
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in self._rows(queryset)]
+
+    def iterate(self, queryset, chunk_size=2000):
+        """
+        Lazily yield dictionaries of the queryset's rows fetching them from
+        the database by `chunk_size` rows (with `QuerySet.iterator`).
+        """
+        keys = self.keys
+        rows = self._rows(queryset)
+        try:
+            rows = rows.iterator(chunk_size=chunk_size)
+        except TypeError:
+            # Django <2.0 doesn't accept chunk_size.
+            rows = rows.iterator()
+        for row in rows:
+            yield dict(zip(keys, row))
+
+    def json_response(self, queryset, key='results', request=None):
+        """
+        Return `JsonResponse` with `{key: [...]}`.
+        """
+        return JsonResponse({key: self.serialize(queryset)}, request=request)
+
+    def streaming_response(self, queryset, chunk_size=2000):
+        """
+        Return `StreamingJsonResponse` with a JSON array of the rows.
+        """
+        return StreamingJsonResponse(self.iterate(queryset, chunk_size))
+
+
+_serializers = OrderedDict()
+_serializers_lock = threading.Lock()
+
+
+def get_serializer(model, fields):
+    """
+    Return the serializer of `model` and `fields` compiled on the first call
+    with these arguments (e.g. for fields requested with
+    `SparseFieldsetsMixin`).
+
+    Serializers are cached by the set of fields, so the same fields in a
+    different order (clients choose it) don't compile a new serializer, and
+    at most `JUICE_SERIALIZER_CACHE_SIZE` (256 by default) least recently
+    used serializers are kept. The returned serializer has the fields in the
+    requested order.
+    """
+    fields = tuple(tuple(f) if isinstance(f, list) else f for f in fields)
+    key = (model, frozenset(fields))
+    with _serializers_lock:
+        serializer = _serializers.pop(key, None)
+        if serializer is not None:
+            _serializers[key] = serializer
+    if serializer is None:
+        serializer = ValuesSerializer(model, fields)
+        max_size = getattr(settings, 'JUICE_SERIALIZER_CACHE_SIZE', 256)
+        with _serializers_lock:
+            _serializers[key] = serializer
+            while len(_serializers) > max_size:
+                _serializers.popitem(last=False)
+
+    keys, paths = _split_fields(fields)
+    if serializer.keys != keys or serializer.paths != paths:
+        # The same fields in another order: they are already validated.
+        serializer = copy.copy(serializer)
+        serializer.keys, serializer.paths = keys, paths
+    return serializer
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Views and view mixins.
+
+`flatten_dispatch` - a class decorator which replaces the chain of juice
+mixins' `dispatch` methods with one precompiled dispatch function.
+"""
+
+from .base import flatten_dispatch
+
+__all__ = ['flatten_dispatch']
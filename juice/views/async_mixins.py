@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Async versions of view mixins for async class-based views (requires
+Python 3 and Django >=3.1, Django >=5.0 for async authentication checks
+without a thread hop).
+
+`AsyncEnsureCsrfCookieMixin` - an async version of `EnsureCsrfCookieMixin`.
+
+`AsyncLoginRequiredMixin` - an async version of `LoginRequiredMixin`.
+
+`AsyncAjaxLoginRequiredMixin` - an async version of `AjaxLoginRequiredMixin`.
+
+`AsyncUrlKwargsMixing` - an async version of `UrlKwargsMixing`.
+
+`AsyncPostParamsExtractionMixin` and `AsyncGetParamsExtractionMixin` - async
+versions of the params extraction mixins.
+
+All the mixins of an async view must be async: they await the rest of the
+dispatch chain and return early responses as coroutine results.
+"""
+from __future__ import unicode_literals
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseForbidden
+from django.shortcuts import resolve_url
+from django.views.decorators.csrf import ensure_csrf_cookie
+
+from .generic.ajax_action import (RequestParamsExtractionMixin,
+                                  PostParamsExtractionMixin,
+                                  GetParamsExtractionMixin)
+from .mixins import UrlKwargsMixing
+
+
+async def is_authenticated(request):
+    """
+    Check if the request's user is authenticated without blocking the event
+    loop. `request.auser` is used if it's available (Django >=5.0), otherwise
+    the user is loaded in a thread.
+    """
+    auser = getattr(request, 'auser', None)
+    if auser is not None:
+        user = await auser()
+        return user.is_authenticated
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+@ensure_csrf_cookie
+async def _ensure_csrf_cookie_dispatch(request, view, *args, **kwargs):
+    return await super(AsyncEnsureCsrfCookieMixin, view).dispatch(
+        request, *args, **kwargs)
+
+
+class AsyncEnsureCsrfCookieMixin(object):
+    """
+    An async version of `EnsureCsrfCookieMixin` (requires Django >=5.0).
+    The mixin must be the first (the left-most) in view's superclass list.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        return await _ensure_csrf_cookie_dispatch(request, self,
+                                                  *args, **kwargs)
+
+
+class AsyncLoginRequiredMixin(object):
+    """
+    An async version of `LoginRequiredMixin`. Redirects anonymous users to
+    `login_url` (`LOGIN_URL` setting by default) passing the current path in
+    `redirect_field_name` GET parameter.
+    The mixin must be the first (the left-most) in view's superclass list
+    after AsyncEnsureCsrfCookieMixin (if it's used).
+    """
+
+    login_url = None
+    redirect_field_name = REDIRECT_FIELD_NAME
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not await is_authenticated(request):
+            return redirect_to_login(
+                request.get_full_path(),
+                resolve_url(self.login_url or settings.LOGIN_URL),
+                self.redirect_field_name)
+        return await super(AsyncLoginRequiredMixin, self).dispatch(
+            request, *args, **kwargs)
+
+
+class AsyncAjaxLoginRequiredMixin(object):
+    """
+    An async version of `AjaxLoginRequiredMixin`. Returns
+    HttpResponseForbidden in case user isn't authenticated.
+    The mixin must be the first (the left-most) in view's superclass list.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not await is_authenticated(request):
+            return HttpResponseForbidden()
+        return await super(AsyncAjaxLoginRequiredMixin, self).dispatch(
+            request, *args, **kwargs)
+
+
+class AsyncUrlKwargsMixing(UrlKwargsMixing):
+    """
+    An async version of `UrlKwargsMixing`. Uses the same per-class compiled
+    extraction plan.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self._extract_url_kwargs(request, *args, **kwargs)
+        return await super(UrlKwargsMixing, self).dispatch(
+            request, *args, **kwargs)
+
+
+class _AsyncParamsExtractionMixin(object):
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = self._extract_params(request, *args, **kwargs)
+        if response is not None:
+            return response
+        # Skip the sync dispatch of the params extraction mixin.
+        return await super(RequestParamsExtractionMixin, self).dispatch(
+            request, *args, **kwargs)
+
+
+class AsyncPostParamsExtractionMixin(_AsyncParamsExtractionMixin,
+                                     PostParamsExtractionMixin):
+    """
+    An async version of `PostParamsExtractionMixin`. Uses the same per-class
+    compiled extraction plan.
+    """
+
+
+class AsyncGetParamsExtractionMixin(_AsyncParamsExtractionMixin,
+                                    GetParamsExtractionMixin):
+    """
+    An async version of `GetParamsExtractionMixin`. Uses the same per-class
+    compiled extraction plan.
+    """
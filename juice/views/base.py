@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Base machinery for juice views.
+
+`JuiceViewMetaclass` - a metaclass which lets juice mixins validate and
+compile their configuration once per class instead of on every request.
+
+`flatten_dispatch` - a class decorator which replaces the chain of juice
+mixins' `dispatch` methods with one precompiled dispatch function.
+"""
+from __future__ import unicode_literals
+from functools import update_wrapper
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class JuiceViewMetaclass(type):
+    """
+    A metaclass which lets juice mixins validate and compile their
+    configuration once, when a view class is created.
+
+    Every class in the MRO of the new class may define a `_compile_class`
+    classmethod in its own body. All of them are called (from the most basic
+    class to the most derived one) with the new class as an argument, so
+    configuration errors show up at import time and compiled structures can
+    be stored on the class and shared between requests.
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(JuiceViewMetaclass, cls).__init__(name, bases, attrs)
+
+        for klass in reversed(cls.__mro__):
+            compile_class = klass.__dict__.get('_compile_class')
+            if compile_class is not None:
+                compile_class.__get__(None, cls)()
+
+
+def _chain_checks(checks, handler):
+    """
+    Return a function which runs `checks` one by one and calls `handler` if
+    none of them returned a response.
+    """
+    def run_checks(request, view, *args, **kwargs):
+        for check in checks:
+            response = check(view, request, *args, **kwargs)
+            if response is not None:
+                return response
+        return handler(request, view, *args, **kwargs)
+    return run_checks
+
+
+def _compile_dispatch(owner, view_class):
+    """
+    Compile the dispatch function for `view_class` from the juice mixins
+    which follow `owner` in the MRO.
+
+    A juice mixin takes part in the dispatch pipeline if it defines
+    `dispatch` and one of the following in its own body:
+        * `_dispatch_decorator` - a classmethod which returns a view decorator
+          (e.g. `login_required`) to apply to the rest of the pipeline;
+        * `_dispatch_check` - a name of a method with `dispatch` signature
+          which returns a response to stop dispatching or `None` to go on.
+
+    The first class which defines some other `dispatch` (usually `View`)
+    terminates the pipeline.
+    """
+    mro = view_class.__mro__
+    steps = []
+    terminal = None
+    for klass in mro[mro.index(owner) + 1:]:
+        if 'dispatch' not in klass.__dict__:
+            continue
+        decorator = klass.__dict__.get('_dispatch_decorator')
+        check = klass.__dict__.get('_dispatch_check')
+        if decorator is not None:
+            steps.append((None, decorator.__get__(None, view_class)()))
+        elif check is not None:
+            steps.append((getattr(view_class, check), None))
+        else:
+            terminal = klass.dispatch
+            break
+
+    if terminal is None:
+        raise ImproperlyConfigured(
+            "Class '{}' has no dispatch to terminate the pipeline."
+            .format(view_class.__name__))
+
+    def call_dispatch(request, view, *args, **kwargs):
+        return terminal(view, request, *args, **kwargs)
+
+    # Build the pipeline from the inside out. Consecutive checks are run by
+    # one loop, decorators are applied only once here instead of on every
+    # request as `method_decorator` does.
+    handler = call_dispatch
+    checks = []
+    for check, decorator in reversed(steps):
+        if check is not None:
+            checks.insert(0, check)
+            continue
+        if checks:
+            handler = _chain_checks(tuple(checks), handler)
+            checks = []
+        handler = decorator(handler)
+    if checks:
+        handler = _chain_checks(tuple(checks), handler)
+    return handler
+
+
+def flatten_dispatch(cls):
+    """
+    A class decorator which replaces the chain of `super().dispatch` calls
+    and `method_decorator` wrappers of juice mixins (`EnsureCsrfCookieMixin`,
+    `LoginRequiredMixin`, `AjaxLoginRequiredMixin`,
+    `StoreArgsBeforeDispatchMixin`, `UrlKwargsMixing`, the params extraction
+    mixins) with one function compiled when the class is created.
+
+    The checks are performed with the same semantics and in the same order
+    as with the ordinary chain of calls.
+    The decorated class must not define `dispatch` itself.
+
+    Example:
+
+        @flatten_dispatch
+        class MyView(EnsureCsrfCookieMixin, LoginRequiredMixin,
+                     UrlKwargsMixing, PostParamsExtractionMixin, View):
+            # ... class content ...
+    """
+    if 'dispatch' in cls.__dict__:
+        raise ImproperlyConfigured(
+            "Class '{}' must not define dispatch to be flattened."
+            .format(cls.__name__))
+
+    # Subclasses may override checks, so the pipeline is compiled for every
+    # concrete class on its first request.
+    handlers = {cls: _compile_dispatch(cls, cls)}
+
+    def dispatch(self, request, *args, **kwargs):
+        view_class = type(self)
+        handler = handlers.get(view_class)
+        if handler is None:
+            handler = handlers[view_class] = _compile_dispatch(cls,
+                                                               view_class)
+        return handler(request, self, *args, **kwargs)
+
+    update_wrapper(dispatch, cls.dispatch)
+    cls.dispatch = dispatch
+    return cls
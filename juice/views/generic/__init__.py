@@ -4,12 +4,40 @@ Generic views for different purposes.
 
 `ConfirmationView` - a generic view which helps solve a problem of showing
 confirmation forms for different actions.
+
+`TokenConfirmationView` - a version of `ConfirmationView` which uses a signed
+token instead of a form and a template.
+
+`BulkConfirmationView` - a version of `ConfirmationView` which confirms an
+operation on a selection of objects and performs it in chunked batches.
+
+`AjaxActionView` - a generic view which performs an action requested by Ajax
+POST request.
+
+`BatchAjaxActionView` - a version of `AjaxActionView` which performs many
+actions in one request.
+
+`JobStatusView` - a view which reports the status of an action executed in
+the background.
+
+`EventStreamView` - an async view which pushes messages of `juice.pubsub`
+channels to clients (Django >=4.2).
 """
+import django
 
-from .confirmation import ConfirmationView
-from .ajax_action import (AjaxActionView, ParamExtractionError,
+
+from .confirmation import (ConfirmationView, TokenConfirmationView,
+                           BulkConfirmationView)
+from .ajax_action import (AjaxActionView, BatchAjaxActionView,
+                          ParamExtractionError,
                           PostParamsExtractionMixin, GetParamsExtractionMixin)
+from .job_status import JobStatusView
+
+__all__ = ['ConfirmationView', 'TokenConfirmationView', 'BulkConfirmationView',
+           'AjaxActionView', 'BatchAjaxActionView', 'ParamExtractionError',
+           'PostParamsExtractionMixin', 'GetParamsExtractionMixin',
+           'JobStatusView']
 
-__all__ = ['ConfirmationView',
-           'AjaxActionView', 'ParamExtractionError',
-           'PostParamsExtractionMixin', 'GetParamsExtractionMixin']
+if django.VERSION >= (4, 2):
+    from .event_stream import EventStreamView
+    __all__.append('EventStreamView')
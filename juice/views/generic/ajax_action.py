@@ -1,119 +1,795 @@
 # -*- coding: utf-8 -*-
-from types import MethodType
+import copy
+import logging
 
+from django.db import transaction
 from django.views.generic import View
 from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
-from django.utils import six
+from django.utils.datastructures import MultiValueDict
+
+from ..base import JuiceViewMetaclass
+from ... import compat
+from ..mixins import BackgroundActionMixin
+from ...concurrency import CoalescingTimeout
+from ...concurrency import SingleFlight
+from ...encoders import loads
+from ...http import JsonResponse
+from ...http import _accepted_coding
+
+logger = logging.getLogger(__name__)
 
 
 class ParamExtractionError(Exception):
     pass
 
 
-class RequestParamsExtractionMixin(object):
-    def __init__(self, *args, **kwargs):
-        super(RequestParamsExtractionMixin, self).__init__(*args, **kwargs)
+class _BatchRollback(Exception):
+    pass
 
-        if not 'method' in kwargs:
-            raise ImproperlyConfigured(
-                "Keyword argument 'method' is required "
-                "with possible values 'post' or 'get'.")
-        self.method = kwargs['method']
-        if self.method not in ['post', 'get']:
-            raise ImproperlyConfigured(
-                "Allowed values for 'method' are 'post' and 'get'.")
 
-        def get_handler(param_name, param_type):
-            attr_name = '_'+param_name
+_MISSING = object()
+
+
+def _str_handler(param_name, attr_name, default=_MISSING):
+    def handler(view, request, params):
+        if param_name not in params:
+            if default is _MISSING:
+                raise ParamExtractionError
+            setattr(view, attr_name, default)
+            return
+        setattr(view, attr_name, params[param_name])
+    return handler
+
+
+def _int_handler(param_name, attr_name, default=_MISSING):
+    def handler(view, request, params):
+        value = params.get(param_name, None)
+        if value is None and default is not _MISSING:
+            setattr(view, attr_name, default)
+            return
+        try:
+            setattr(view, attr_name, int(value))
+        except (TypeError, ValueError):
+            raise ParamExtractionError
+    return handler
+
+
+def _bool_handler(param_name, attr_name, default=_MISSING):
+    def handler(view, request, params):
+        value = params.get(param_name, None)
+        if value is None and default is not _MISSING:
+            setattr(view, attr_name, default)
+            return
+        if value is None or value.lower() not in ['true', 'false']:
+            raise ParamExtractionError
+        setattr(view, attr_name, value.lower() == 'true')
+    return handler
+
+
+def _custom_handler(param_name, attr_name):
+    handler_name = '_handle_' + param_name
+
+    def handler(view, request, params):
+        getattr(view, handler_name)(request)
+    return handler
 
-            def str_handler(self, request):
-                params = getattr(request, self.method.upper())
-                if param_name not in params:
+
+def _cursor_handler(param_name, attr_name):
+    def handler(view, request, params):
+        value = params.get(param_name, None)
+        if value is None or value == '':
+            setattr(view, attr_name, None)
+            return
+        if not isinstance(value, compat.string_types):
+            raise ParamExtractionError
+        try:
+            setattr(view, attr_name, view.decode_cursor(value))
+        except ValueError:
+            raise ParamExtractionError
+    return handler
+
+
+def _fields_handler(param_name, attr_name):
+    def handler(view, request, params):
+        if hasattr(params, 'getlist'):
+            values = params.getlist(param_name)
+        else:
+            values = params.get(param_name, [])
+            if not isinstance(values, list):
+                values = [values]
+        if (len(values) > view.list_params_max_items or
+                not all(isinstance(v, compat.string_types) for v in values)):
+            raise ParamExtractionError
+        # Check the limits before doing any parsing work.
+        if sum(len(v) for v in values) > (view.list_params_max_items *
+                                          (view.list_params_max_length + 1)):
+            raise ParamExtractionError
+
+        names = [name.strip() for value in values
+                 for name in value.split(',') if name.strip()]
+        if not names:
+            setattr(view, attr_name, None)
+            return
+        try:
+            setattr(view, attr_name, view.clean_fields(names))
+        except ValueError:
+            raise ParamExtractionError
+    return handler
+
+
+def _to_id(value):
+    value = int(value)
+    if value <= 0:
+        raise ValueError
+    return value
+
+
+def _list_handler(convert, container, dedup=False):
+    """
+    Return a factory of handlers of list parameters which converts every
+    element with `convert` and puts the result into `container`.
+    """
+    def factory(param_name, attr_name, max_items, max_length,
+                separator=None, unique=dedup):
+        # The longest raw value which can't exceed the limits.
+        max_raw_length = max_items * (max_length + 1)
+
+        def handler(view, request, params):
+            values = params.getlist(param_name)
+            # Check the limits before doing any parsing work.
+            if len(values) > max_items:
+                raise ParamExtractionError
+            if separator is not None:
+                if sum(len(v) for v in values) > max_raw_length:
                     raise ParamExtractionError
-                setattr(self, attr_name, request.POST[param_name])
-
-            def int_handler(self, request):
-                params = getattr(request, self.method.upper())
-                try:
-                    setattr(self,
-                            attr_name,
-                            int(params.get(param_name, None)))
-                except (TypeError, ValueError):
+                values = [v for value in values
+                          for v in value.split(separator) if v]
+                if len(values) > max_items:
                     raise ParamExtractionError
 
-            def bool_handler(self, request):
-                params = getattr(request, self.method.upper())
-                value = params.get(param_name, None)
-                if value is None or value.lower() not in ['true', 'false']:
+            result = []
+            seen = set()
+            try:
+                for value in values:
+                    if len(value) > max_length:
+                        raise ParamExtractionError
+                    value = convert(value)
+                    if unique:
+                        if value in seen:
+                            continue
+                        seen.add(value)
+                    result.append(value)
+            except ValueError:
+                raise ParamExtractionError
+            setattr(view, attr_name, container(result))
+        return handler
+    return factory
+
+
+_HANDLER_FACTORIES = {
+    'str': _str_handler,
+    'int': _int_handler,
+    'bool': _bool_handler,
+    'custom': _custom_handler,
+    'cursor': _cursor_handler,
+    'fields': _fields_handler,
+    'str_list': _list_handler(compat.text_type, list),
+    'int_list': _list_handler(int, list),
+    'id_set': _list_handler(_to_id, set, dedup=True),
+}
+
+
+def _is_int(value):
+    return (isinstance(value, compat.integer_types) and
+            not isinstance(value, bool))
+
+
+def _is_id(value):
+    return _is_int(value) and value > 0
+
+
+def _json_scalar_handler(check):
+    """
+    Return a factory of handlers of parameters from a decoded JSON object
+    which accept a value if `check(value)` is true.
+    """
+    def factory(param_name, attr_name, default=_MISSING):
+        def handler(view, request, params):
+            value = params.get(param_name, _MISSING)
+            if value is _MISSING and default is not _MISSING:
+                setattr(view, attr_name, default)
+                return
+            if value is _MISSING or not check(value):
+                raise ParamExtractionError
+            setattr(view, attr_name, value)
+        return handler
+    return factory
+
+
+def _json_list_handler(check, container, dedup=False):
+    """
+    Return a factory of handlers of JSON array parameters which accept
+    elements if `check(element)` is true.
+    """
+    def factory(param_name, attr_name, max_items, max_length,
+                separator=None, unique=dedup):
+        def handler(view, request, params):
+            values = params.get(param_name, [])
+            if not isinstance(values, list) or len(values) > max_items:
+                raise ParamExtractionError
+
+            result = []
+            seen = set()
+            for value in values:
+                if not check(value):
+                    raise ParamExtractionError
+                if (isinstance(value, compat.string_types) and
+                        len(value) > max_length):
                     raise ParamExtractionError
-                setattr(self, attr_name, value.lower() == 'true')
+                if unique:
+                    if value in seen:
+                        continue
+                    seen.add(value)
+                result.append(value)
+            setattr(view, attr_name, container(result))
+        return handler
+    return factory
+
+
+def _is_str(value):
+    return isinstance(value, compat.string_types)
+
+
+_JSON_HANDLER_FACTORIES = {
+    'str': _json_scalar_handler(_is_str),
+    'int': _json_scalar_handler(_is_int),
+    'bool': _json_scalar_handler(lambda value: isinstance(value, bool)),
+    'custom': _custom_handler,
+    'cursor': _cursor_handler,
+    'fields': _fields_handler,
+    'str_list': _json_list_handler(_is_str, list),
+    'int_list': _json_list_handler(_is_int, list),
+    'id_set': _json_list_handler(_is_id, set, dedup=True),
+}
+
+_LIST_PARAM_TYPES = ('str_list', 'int_list', 'id_set')
+
+_LIST_PARAM_OPTIONS = ('max_items', 'max_length', 'separator', 'unique')
 
-            return locals()[param_type + '_handler']
+_SCALAR_PARAM_TYPES = ('str', 'int', 'bool')
 
-        norm_parameters = []
-        for x in self._get_param_dict():
 
-            if isinstance(x, six.string_types):
+class _JsonBody(object):
+    """
+    A read-only view of the JSON object in the request body. The body is
+    decoded on the first access, so it isn't touched if no parameter needs
+    it.
+    """
+
+    __slots__ = ('view', 'request')
+
+    def __init__(self, view, request):
+        self.view = view
+        self.request = request
+
+    def get(self, key, default=None):
+        return self.view.get_json_body(self.request).get(key, default)
+
+
+class RequestParamsExtractionMixin(compat.with_metaclass(JuiceViewMetaclass,
+                                                        object)):
+    """
+    A base for view mixins which extract parameters from the request's `POST`
+    or `GET` dictionary and make them available inside a view as attributes
+    (with '_' prefix).
+
+    The list of parameters is taken from `<method>_parameters` attribute.
+    An element of the list can be:
+        * a string with parameter name (the parameter is treated as `str`);
+        * a tuple in (param_name, param_type) format, where param_type is one
+          of 'str', 'int', 'bool' or 'custom'. For 'custom' parameters the
+          view must define `_handle_<param_name>(request)` method;
+        * a tuple in (param_name, list_type) or (param_name, list_type,
+          options) format for list parameters (repeated in the query string,
+          e.g. `ids=1&ids=2`). list_type is one of 'str_list', 'int_list'
+          (lists of strings and integers) or 'id_set' (a set of positive
+          integers). Options is a dictionary with keys:
+            - `max_items` - the maximum number of elements
+              (`list_params_max_items` attribute by default, 100);
+            - `max_length` - the maximum length of an element
+              (`list_params_max_length` attribute by default, 100);
+            - `separator` - also split each value by the separator
+              (e.g. ',' for `ids=1,2,3`);
+            - `unique` - drop duplicates keeping the order (always done for
+              'id_set').
+          Requests exceeding the limits are rejected with 400 before any
+          element is parsed. A missing list parameter gives an empty list;
+        * a tuple in (param_name, param_type, {'default': value}) format for
+          an optional 'str', 'int' or 'bool' parameter;
+        * a tuple in (param_name, 'cursor') format for an optional pagination
+          cursor decoded by the view's `decode_cursor` method (see
+          `KeysetPaginationMixin`), a missing cursor gives `None`;
+        * a tuple in (param_name, 'fields') format for an optional sparse
+          fieldset (`fields=id,title`) validated by the view's
+          `clean_fields` method (see `SparseFieldsetsMixin`), a missing
+          fieldset gives `None`.
+
+    If `json_body` is `True` (only for 'post' method) the parameters are taken
+    from a JSON object in the request body instead of `POST`. The body is
+    decoded at most once per request and only when some parameter is
+    requested; bodies longer than `json_body_max_size` bytes (1 MB by
+    default) are rejected with 400 before decoding. The declared types are
+    checked against the decoded values: 'str', 'int' and 'bool' parameters
+    must be JSON strings, integers and booleans, list parameters must be JSON
+    arrays of the corresponding elements (`separator` option is ignored).
+    Custom handlers can get the decoded object with `get_json_body(request)`.
+
+    The parameters are validated and compiled into an extraction plan once,
+    when the class is created, so configuration errors are raised at import
+    time and each request only runs the plan.
+    """
+
+    method = None
+    list_params_max_items = 100
+    list_params_max_length = 100
+    json_body = False
+    json_body_max_size = 1024 * 1024
+
+    @classmethod
+    def _compile_class(cls):
+        """
+        Validate `<method>_parameters` and compile them into a tuple of
+        (param, handler) pairs shared by all instances of the class.
+        """
+        if cls.method is None:
+            cls._params_extraction_plan = None
+            return
+        if cls.method not in ['post', 'get']:
+            raise ImproperlyConfigured(
+                "Allowed values for 'method' are 'post' and 'get'.")
+        if cls.json_body and cls.method != 'post':
+            raise ImproperlyConfigured(
+                "Attribute 'json_body' requires 'post' method.")
+
+        factories = (_JSON_HANDLER_FACTORIES if cls.json_body
+                     else _HANDLER_FACTORIES)
+        plan = []
+        for x in getattr(cls, cls.method + '_parameters'):
+            options = {}
+            if isinstance(x, compat.string_types):
                 param_name, param_type = x, 'str'
+            elif len(x) == 3:
+                param_name, param_type, options = x
             else:
                 param_name, param_type = x
 
-            if param_type in ['str', 'int', 'bool']:
-                handler = MethodType(
-                    get_handler(param_name, param_type), self)
-            elif param_type == 'custom':
-                handler = getattr(self, "_handle_"+param_name)
-            else:
+            if param_type not in _HANDLER_FACTORIES:
                 msg = "Unknown param type '{0}'".format(param_type)
                 raise ImproperlyConfigured(msg)
+            if (param_type == 'custom' and
+                    not hasattr(cls, '_handle_' + param_name)):
+                raise ImproperlyConfigured(
+                    "Custom param '{0}' requires '_handle_{0}' method."
+                    .format(param_name))
+            if (param_type == 'cursor' and
+                    not hasattr(cls, 'decode_cursor')):
+                raise ImproperlyConfigured(
+                    "Cursor param '{0}' requires 'decode_cursor' method."
+                    .format(param_name))
+            if (param_type == 'fields' and
+                    not hasattr(cls, 'clean_fields')):
+                raise ImproperlyConfigured(
+                    "Fields param '{0}' requires 'clean_fields' method."
+                    .format(param_name))
+
+            if param_type in _LIST_PARAM_TYPES:
+                unknown = set(options) - set(_LIST_PARAM_OPTIONS)
+                if unknown:
+                    raise ImproperlyConfigured(
+                        "Unknown options {0} of param '{1}'."
+                        .format(sorted(unknown), param_name))
+                options = dict(options)
+                options.setdefault('max_items', cls.list_params_max_items)
+                options.setdefault('max_length', cls.list_params_max_length)
+            elif param_type in _SCALAR_PARAM_TYPES:
+                unknown = set(options) - set(['default'])
+                if unknown:
+                    raise ImproperlyConfigured(
+                        "Unknown options {0} of param '{1}'."
+                        .format(sorted(unknown), param_name))
+            elif options:
+                raise ImproperlyConfigured(
+                    "Param '{0}' of type '{1}' doesn't take options."
+                    .format(param_name, param_type))
 
-            norm_parameters.append((x, handler))
-        setattr(self, self._get_param_dict_name(), norm_parameters)
+            handler = factories[param_type](param_name, '_' + param_name,
+                                            **options)
+            plan.append((x, handler))
+        cls._params_extraction_plan = tuple(plan)
+
+    def __init__(self, *args, **kwargs):
+        super(RequestParamsExtractionMixin, self).__init__(*args, **kwargs)
+
+        if self._params_extraction_plan is None:
+            raise ImproperlyConfigured(
+                "Attribute 'method' is required "
+                "with possible values 'post' or 'get'.")
 
-    def _get_param_dict_name(self):
-        return self.method + '_parameters'
+    _dispatch_check = '_extract_params'
 
-    def _get_param_dict(self):
-        return getattr(self, self._get_param_dict_name())
+    def _extract_params(self, request, *args, **kwargs):
+        """
+        Run the compiled extraction plan against the request. Return
+        `HttpResponseBadRequest` if some parameter can't be extracted.
+        """
+        if request.method.lower() != self.method:
+            return None
+        if self.json_body:
+            params = _JsonBody(self, request)
+        else:
+            params = getattr(request, self.method.upper())
+        try:
+            self._apply_params_plan(request, params)
+        except ParamExtractionError:
+            return HttpResponseBadRequest()
+        return None
+
+    def get_json_body(self, request):
+        """
+        Return the JSON object from the request body. The body is decoded
+        once per request. Raise `ParamExtractionError` if the body is longer
+        than `json_body_max_size` or isn't a JSON object.
+        """
+        data = getattr(request, '_juice_json_body', None)
+        if data is not None:
+            return data
+
+        # Check the declared length first to not read a huge body at all.
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            raise ParamExtractionError
+        if length > self.json_body_max_size:
+            raise ParamExtractionError
+        body = request.body
+        if len(body) > self.json_body_max_size:
+            raise ParamExtractionError
+
+        try:
+            data = loads(body)
+        except ValueError:
+            raise ParamExtractionError
+        if not isinstance(data, dict):
+            raise ParamExtractionError
+        request._juice_json_body = data
+        return data
+
+    def _apply_params_plan(self, request, params):
+        """
+        Run the compiled extraction plan against `params` dictionary. Raise
+        `ParamExtractionError` if some parameter can't be extracted.
+        """
+        for x, handler in self._params_extraction_plan:
+            handler(self, request, params)
 
     def dispatch(self, request, *args, **kwargs):
-        if request.method.lower() == self.method:
-            try:
-                for x, handler in self._get_param_dict():
-                    handler(request)
-            except ParamExtractionError:
-                return HttpResponseBadRequest()
+        response = self._extract_params(request, *args, **kwargs)
+        if response is not None:
+            return response
         return super(RequestParamsExtractionMixin, self).dispatch(
             request, *args, **kwargs)
 
 
 class PostParamsExtractionMixin(RequestParamsExtractionMixin):
+    method = 'post'
     post_parameters = []
 
-    def __init__(self, *args, **kwargs):
-        kwargs['method'] = 'post'
-        super(PostParamsExtractionMixin, self).__init__(*args, **kwargs)
-
 
 class GetParamsExtractionMixin(RequestParamsExtractionMixin):
+    method = 'get'
     get_parameters = []
 
-    def __init__(self, *args, **kwargs):
-        kwargs['method'] = 'get'
-        super(GetParamsExtractionMixin, self).__init__(*args, **kwargs)
 
+def _is_ajax(request):
+    # `HttpRequest.is_ajax` was removed in Django 4.0.
+    return request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
+
+
+def _clone_response(response):
+    """
+    Return a copy of a non-streaming response which can be returned to
+    another request.
+    """
+    clone = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        clone[header] = value
+    clone.cookies = copy.deepcopy(response.cookies)
+    if hasattr(response, 'data'):
+        clone.data = response.data
+    return clone
 
-class AjaxActionView(PostParamsExtractionMixin,
+
+def _coalesce_value(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return value
+
+
+class AjaxActionView(BackgroundActionMixin,
+                     PostParamsExtractionMixin,
                      View):
     """
+    A view which extracts `post_parameters` from an Ajax POST request and
+    calls `action(request)`.
+
+    With `json_body = True` the parameters are taken from a JSON object in
+    the request body (see `RequestParamsExtractionMixin`).
 
+    If `coalesce` is `True`, identical concurrent requests (double clicks,
+    client retries) execute `action` once in the current process: requests
+    with the same key wait up to `coalesce_wait` seconds (10 by default,
+    then they get 409) for the first one and get a copy of its response.
+    The key is the user (or the session for anonymous users, requests
+    without both aren't coalesced), the URL arguments, the content coding
+    accepted by the client (the response may be compressed) and the
+    `Idempotency-Key` header if it's sent or the extracted parameters
+    otherwise; override `get_coalesce_key` to change it. With
+    `coalesce_result_ttl` greater than 0 successful (status < 400) responses
+    of requests with `Idempotency-Key` are also returned to the requests
+    with the same key during that many seconds (retries of the same
+    request); requests without it are only coalesced while they are in
+    flight, so an intentionally repeated action (e.g. a toggle) is executed
+    again. The action must return a non-streaming response.
+
+    If `background` is `True` the action is submitted to the background jobs
+    backend and 202 with the job id is returned (see
+    `BackgroundActionMixin`). With coalescing the identical requests get the
+    same job.
     """
 
     http_method_names = ['post']
 
+    coalesce = False
+    coalesce_wait = 10
+    coalesce_result_ttl = 0
+    idempotency_key_max_length = 255
+
+    @classmethod
+    def _compile_class(cls):
+        cls._single_flight = None
+        if cls.coalesce:
+            cls._single_flight = SingleFlight(ttl=cls.coalesce_result_ttl)
+
+    def get_coalesce_key(self, request):
+        """
+        Return a hashable key of the request or `None` to not coalesce it.
+        """
+        user = getattr(request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        if callable(authenticated):
+            authenticated = authenticated()
+        if authenticated:
+            identity = ('user', user.pk)
+        else:
+            session = getattr(request, 'session', None)
+            if session is None or session.session_key is None:
+                return None
+            identity = ('session', session.session_key)
+        # The shared response may be compressed, so the requests must accept
+        # the same coding.
+        identity += (repr(self.args), repr(sorted(self.kwargs.items())),
+                     _accepted_coding(request))
+
+        idempotency_key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if idempotency_key:
+            return identity, 'key', idempotency_key
+
+        params = []
+        for x, handler in self._params_extraction_plan:
+            name = x if isinstance(x, compat.string_types) else x[0]
+            params.append(
+                (name, _coalesce_value(getattr(self, '_' + name, None))))
+        return identity, 'params', repr(params)
+
+    def perform_action(self, request):
+        """
+        Execute the action or submit it to the background.
+        """
+        if self.background:
+            return self.submit_action(request)
+        return self.action(request)
+
     def post(self, request, *args, **kwargs):
-        if not request.is_ajax():
+        if not _is_ajax(request):
             return HttpResponseBadRequest("Not Ajax request.")
 
-        return self.action(request)
+        if self._single_flight is None:
+            return self.perform_action(request)
+
+        idempotency_key = request.META.get('HTTP_IDEMPOTENCY_KEY', '')
+        if len(idempotency_key) > self.idempotency_key_max_length:
+            return HttpResponseBadRequest("Idempotency-Key is too long.")
+        key = self.get_coalesce_key(request)
+        if key is None:
+            return self.perform_action(request)
+
+        # Only retries of the same request (with the same Idempotency-Key)
+        # may get a kept response.
+        keep = bool(idempotency_key)
+        try:
+            response, shared = self._single_flight.do(
+                key,
+                lambda: _clone_response(self.perform_action(request)),
+                timeout=self.coalesce_wait,
+                cacheable=lambda response: (keep and
+                                            response.status_code < 400))
+        except CoalescingTimeout:
+            return HttpResponse("The same request is in progress.",
+                                status=409)
+        # Every request gets its own copy, middleware may modify it.
+        return _clone_response(response)
+
+
+def _to_param_value(value):
+    """
+    Convert a JSON value to the string form the params handlers expect.
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return compat.text_type(value)
+
+
+class BatchAjaxActionView(AjaxActionView):
+    """
+    A version of `AjaxActionView` which executes many actions in one POST
+    request.
+
+    The request must contain `batch_param_name` ('batch' by default) POST
+    parameter with a JSON array of objects. Each object is a set of action
+    parameters: they are extracted according to `post_parameters` and then
+    `action` is called, exactly as `AjaxActionView` does for a single action.
+    (Custom parameter handlers still receive the request, the current item
+    is available to them as `self.batch_item`.) A `null` value is a missing
+    parameter, a list with `null` makes the batch malformed.
+
+    The response is a JSON array with a result for each item:
+        * `{"status": <code>, "data": <data>}` if `action` returned
+          `JsonResponse`;
+        * `{"status": <code>, "content": <text>}` for other responses;
+        * `{"status": 400, "error": ...}` if parameters can't be extracted or
+          `{"status": 500, "error": ...}` if `action` raised an exception.
+
+    Each item is executed in its own savepoint. If `batch_atomic` is `True`
+    the whole batch is executed in one transaction: the first failed item
+    (an exception or a response with status >= 400) rolls back all of them
+    and the other items are reported with status 424.
+
+    `batch_max_size` - the maximum number of items in a batch (50 by
+    default). Bigger batches are rejected with 400.
+
+    With `json_body = True` the batch is taken from `batch_param_name` key of
+    a JSON object in the request body and the items' values are checked
+    against the declared types as JSON values.
+
+    The items are executed synchronously and aren't coalesced: `background`
+    and `coalesce` are not supported.
+    """
+
+    batch_param_name = 'batch'
+    batch_max_size = 50
+    batch_atomic = False
+
+    @classmethod
+    def _compile_class(cls):
+        for attr_name in ('background', 'coalesce'):
+            if getattr(cls, attr_name):
+                raise ImproperlyConfigured(
+                    "'{}' doesn't support '{}'.".format(cls.__name__,
+                                                        attr_name))
+
+    def _extract_params(self, request, *args, **kwargs):
+        # Parameters are extracted per batch item in `post`.
+        return None
+
+    def _get_batch(self, request):
+        """
+        Decode the batch from the request. Return `None` if it's malformed or
+        too big.
+        """
+        if self.json_body:
+            try:
+                batch = self.get_json_body(request).get(self.batch_param_name)
+            except ParamExtractionError:
+                return None
+        else:
+            raw = request.POST.get(self.batch_param_name, None)
+            if raw is None:
+                return None
+            try:
+                batch = loads(raw)
+            except ValueError:
+                return None
+        if not isinstance(batch, list) or len(batch) > self.batch_max_size:
+            return None
+        items = []
+        for item in batch:
+            if not isinstance(item, dict):
+                return None
+            if self.json_body:
+                items.append(item)
+                continue
+            params = MultiValueDict()
+            for key, value in item.items():
+                if value is None:
+                    # `null` is a missing parameter.
+                    continue
+                if isinstance(value, list):
+                    if None in value:
+                        return None
+                    params.setlist(key, [_to_param_value(v) for v in value])
+                else:
+                    params[key] = _to_param_value(value)
+            items.append(params)
+        return items
+
+    def _execute_item(self, request, params):
+        """
+        Extract parameters of one batch item and execute the action. Return
+        the item result and the failure flag.
+        """
+        self.batch_item = params
+        try:
+            self._apply_params_plan(request, params)
+        except ParamExtractionError:
+            return {'status': 400, 'error': "Bad parameters."}, True
+
+        try:
+            with transaction.atomic():
+                response = self.action(request)
+        except Exception:
+            logger.exception("Batch item of %s failed.",
+                             self.__class__.__name__)
+            return {'status': 500, 'error': "Action failed."}, True
+
+        result = {'status': response.status_code}
+        if isinstance(response, JsonResponse):
+            result['data'] = response.data
+        else:
+            result['content'] = response.content.decode(response.charset)
+        return result, response.status_code >= 400
+
+    def _execute_batch(self, request, items):
+        return [self._execute_item(request, params)[0] for params in items]
+
+    def _execute_atomic_batch(self, request, items):
+        results = []
+        failed_index = None
+        try:
+            with transaction.atomic():
+                for i, params in enumerate(items):
+                    result, failed = self._execute_item(request, params)
+                    results.append(result)
+                    if failed:
+                        failed_index = i
+                        raise _BatchRollback
+        except _BatchRollback:
+            not_executed = {'status': 424, 'error': "Batch rolled back."}
+            return [results[i] if i == failed_index else not_executed
+                    for i in range(len(items))]
+        return results
+
+    def post(self, request, *args, **kwargs):
+        if not _is_ajax(request):
+            return HttpResponseBadRequest("Not Ajax request.")
+
+        items = self._get_batch(request)
+        if items is None:
+            return HttpResponseBadRequest("Malformed batch.")
+
+        if self.batch_atomic:
+            results = self._execute_atomic_batch(request, items)
+        else:
+            results = self._execute_batch(request, items)
+        return JsonResponse(results, request=request)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+An async version of `AjaxActionView` (requires Python 3 and Django >=3.1).
+"""
+from asyncio import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.views.generic import View
+from django.http import HttpResponseBadRequest
+
+from ..async_mixins import AsyncPostParamsExtractionMixin
+
+
+def _to_async(action):
+    sync_action = sync_to_async(action)
+
+    async def async_action(self, request):
+        return await sync_action(self, request)
+    return async_action
+
+
+class AsyncAjaxActionView(AsyncPostParamsExtractionMixin,
+                          View):
+    """
+    An async version of `AjaxActionView`.
+
+    `action` can be defined either as `async def action(self, request)`,
+    which is awaited right in the event loop, or as an ordinary method, which
+    is run in a thread with `sync_to_async` (so it can use the ORM).
+    Which of them is used is determined once, when the class is created.
+
+    Example:
+
+        class ToggleView(AsyncAjaxLoginRequiredMixin, AsyncAjaxActionView):
+            post_parameters = [('item_id', 'int')]
+
+            async def action(self, request):
+                await Item.objects.filter(pk=self._item_id).aupdate(...)
+                return JsonResponse({'ok': True})
+    """
+
+    http_method_names = ['post']
+
+    @classmethod
+    def _compile_class(cls):
+        if iscoroutinefunction(cls.action):
+            cls._async_action = cls.action
+        else:
+            cls._async_action = _to_async(cls.action)
+
+    def action(self, request):
+        raise NotImplementedError
+
+    async def post(self, request, *args, **kwargs):
+        if request.META.get('HTTP_X_REQUESTED_WITH') != 'XMLHttpRequest':
+            return HttpResponseBadRequest("Not Ajax request.")
+
+        return await self._async_action(request)
@@ -1,13 +1,47 @@
 # -*- coding: utf-8 -*-
 from django import forms
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.views.generic.edit import FormView
+from django.http import HttpResponse
 from django.http import HttpResponseRedirect
 from django.http import HttpResponseBadRequest
+from django.utils.html import escape
 
+from ..mixins import BackgroundActionMixin
 from ..mixins import UrlKwargsMixing
+from ...http import JsonResponse
+
+
+def _request_binding(view, request, action_name):
+    """
+    Return the dictionary a signed token of `view` is bound to: the action
+    name, URL kwargs and the user, so the token can't be replayed for
+    another action, object or user.
+    """
+    user = getattr(request, 'user', None)
+    return {
+        'a': action_name,
+        'k': dict((k, '{}'.format(v)) for k, v in view.kwargs.items()),
+        'u': '{}'.format(user.pk) if user is not None and user.pk else None,
+    }
+
+
+def _check_binding(payload, binding):
+    """
+    Return whether a token's `payload` is bound to `binding`.
+    """
+    for key, value in binding.items():
+        if payload.get(key) != value:
+            return False
+    return True
 
 
 class ConfirmationView(UrlKwargsMixing,
+                       BackgroundActionMixin,
                        FormView):
     """
     A generic view which helps solve a problem of showing confirmation form
@@ -73,6 +107,10 @@ class ConfirmationView(UrlKwargsMixing,
     view:
     * *template_name* attribute and/or *get_template_names* method;
     * *action* method of the action which performing you want to be confirmed.
+
+    If *background* attribute is `True` the confirmed action is submitted to
+    the background jobs backend and 202 with the job id is returned instead
+    of the redirect (see `BackgroundActionMixin`).
     """
 
     class __Form(forms.Form):
@@ -91,7 +129,7 @@ class ConfirmationView(UrlKwargsMixing,
     form_class = __Form
     form_name = '_confirm'
 
-    def __extract_urls(self, dictionary):
+    def _extract_urls(self, dictionary):
         """
         Extract back and success URLs from `dictionary` (most likely `POST`
         dictionary).
@@ -143,15 +181,17 @@ class ConfirmationView(UrlKwargsMixing,
 
     def yes(self, request, *args, **kwargs):
         # Skip form validation - not needed.
+        if self.background:
+            return self.submit_action(request)
         self.action(request)
         return HttpResponseRedirect(self.get_success_url())
 
     def get(self, request, *args, **kwargs):
-        self.back_url, self.success_url = self.__extract_urls(request.GET)
+        self.back_url, self.success_url = self._extract_urls(request.GET)
         return super(ConfirmationView, self).get(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
-        self.back_url, self.success_url = self.__extract_urls(request.POST)
+        self.back_url, self.success_url = self._extract_urls(request.POST)
 
         confirm = request.POST.get(self.get_form_name(), None)
         if not confirm or confirm not in ['yes', 'no']:
@@ -159,3 +199,323 @@ class ConfirmationView(UrlKwargsMixing,
         if confirm == 'no':
             return self.no(request)
         return self.yes(request)
+
+
+class TokenConfirmationView(ConfirmationView):
+    """
+    A version of `ConfirmationView` which works without forms and templates.
+
+    1. GET request returns a compact signed confirmation token which binds
+    the view (see `get_action_name`), the url kwargs, the current user, back
+    and success URLs (taken from GET parameters as `ConfirmationView` does)
+    and the time of issue. Depending on `token_format` the response is JSON
+    (`{"token": ..., "back_url": ..., "success_url": ...}`, default) or an
+    HTML fragment with a hidden input named *token_param_name*.
+
+    2. POST request must contain the token in *token_param_name* parameter
+    ("token" by default) and the answer in *form_name* parameter ("yes" or
+    "no"). The view only verifies the token and runs *action*, no form is
+    instantiated and no template is rendered. An invalid token, a token
+    issued for another view, url kwargs or user, or older than
+    `token_max_age` seconds (one hour by default) gives 400.
+
+    Back and success URLs travel inside the token, so their length isn't
+    limited by hidden form fields.
+    """
+
+    token_param_name = 'token'
+    token_format = 'json'
+    token_max_age = 60 * 60
+    token_salt = 'juice.views.generic.TokenConfirmationView'
+
+    def get_action_name(self):
+        """
+        Return the name of the confirmed action bound into the token.
+        """
+        return '{}.{}'.format(self.__class__.__module__,
+                              self.__class__.__name__)
+
+    def get_token_payload(self, request):
+        """
+        Return the dictionary the token is bound to (without the URLs).
+        """
+        return _request_binding(self, request, self.get_action_name())
+
+    def make_token(self, request):
+        payload = self.get_token_payload(request)
+        payload['b'] = self.back_url
+        payload['s'] = self.success_url
+        return signing.dumps(payload, salt=self.token_salt, compress=True)
+
+    def check_token(self, request, token):
+        """
+        Verify the token and return its payload or `None` if it's invalid.
+        """
+        try:
+            payload = signing.loads(token, salt=self.token_salt,
+                                    max_age=self.token_max_age)
+        except signing.BadSignature:
+            return None
+        if not _check_binding(payload, self.get_token_payload(request)):
+            return None
+        return payload
+
+    def get(self, request, *args, **kwargs):
+        self.back_url, self.success_url = self._extract_urls(request.GET)
+        token = self.make_token(request)
+
+        if self.token_format == 'fragment':
+            return HttpResponse(
+                '<input type="hidden" name="{}" value="{}">'.format(
+                    escape(self.token_param_name), escape(token)))
+        return JsonResponse({
+            'token': token,
+            'back_url': self.back_url,
+            'success_url': self.success_url,
+        })
+
+    def post(self, request, *args, **kwargs):
+        confirm = request.POST.get(self.get_form_name(), None)
+        if not confirm or confirm not in ['yes', 'no']:
+            return HttpResponseBadRequest()
+
+        payload = self.check_token(
+            request, request.POST.get(self.token_param_name, ''))
+        if payload is None:
+            return HttpResponseBadRequest()
+        self.back_url, self.success_url = payload['b'], payload['s']
+
+        if confirm == 'no':
+            return self.no(request)
+        return self.yes(request)
+
+
+class _BulkForm(ConfirmationView.form_class):
+    selection = forms.CharField(widget=forms.HiddenInput())
+
+
+class BulkConfirmationView(ConfirmationView):
+    """
+    A version of `ConfirmationView` which confirms an operation on many
+    objects at once (e.g. "delete N selected items").
+
+    1. GET request carries the selection: either ids of the objects in
+    *ids_param_name* parameter ("ids" by default, repeated or separated by
+    commas, at most `selection_max_size` of them) or filter values of the
+    fields listed in `selection_filter_fields` (e.g. `?status=draft`).
+    Invalid ids or filter values give 400.
+    The selection is signed (and bound to the view and the current user) into
+    a hidden *selection* field of the form, the template also gets
+    *selection_size* (the number of ids or `None` for a filter).
+
+    2. On "yes" the selection is verified (a tampered or older than
+    `selection_max_age` seconds selection gives 400) and applied to
+    `get_queryset()` (`queryset` or `model` attribute), so the queryset can
+    also restrict the objects available to the user. The objects are
+    processed in chunks of `bulk_chunk_size` primary keys, each chunk by one
+    set-based query in its own transaction:
+        * `bulk_operation = 'delete'` (default) - `delete()`;
+        * `bulk_operation = 'update'` - `update(**get_update_values())`
+          (`bulk_update_values` attribute by default);
+        * override `process_chunk(queryset)` for something else, it must
+          return the number of processed objects.
+
+    The counts (`{"selected": ..., "processed": ..., "chunks": ...}`) are
+    available as `bulk_counts` attribute; Ajax requests get them as JSON
+    instead of the redirect. With `background = True` they are the job
+    result and the progress is reported after every chunk.
+    """
+
+    form_class = _BulkForm
+
+    model = None
+    queryset = None
+    ids_param_name = 'ids'
+    selection_filter_fields = ()
+    selection_max_size = 10000
+    selection_max_age = 60 * 60
+    selection_salt = 'juice.views.generic.BulkConfirmationView'
+    bulk_chunk_size = 500
+    bulk_operation = 'delete'
+    bulk_update_values = None
+
+    selection_token = None
+    selection_size = None
+    bulk_counts = None
+
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset.all()
+        if self.model is not None:
+            return self.model._default_manager.all()
+        raise ImproperlyConfigured(
+            "'{}' requires 'queryset' or 'model' attribute."
+            .format(self.__class__.__name__))
+
+    def get_update_values(self):
+        if not self.bulk_update_values:
+            raise ImproperlyConfigured(
+                "Attribute 'bulk_update_values' is required for 'update'.")
+        return self.bulk_update_values
+
+    def get_selection(self, request):
+        """
+        Return the selection of the GET request (`{'i': ids}` or
+        `{'f': filter}`) or `None` if there isn't a valid one.
+        """
+        values = request.GET.getlist(self.ids_param_name)
+        if values:
+            # Check the size before parsing, allowing for UUID keys.
+            if sum(len(v) for v in values) > self.selection_max_size * 40:
+                return None
+            ids = [v for value in values for v in value.split(',') if v]
+            if len(ids) > self.selection_max_size:
+                return None
+            pk = self.get_queryset().model._meta.pk
+            try:
+                ids = [pk.to_python(v) for v in ids]
+            except ValidationError:
+                return None
+            return {'i': ids}
+
+        lookups = dict((name, request.GET[name])
+                       for name in self.selection_filter_fields
+                       if name in request.GET)
+        if lookups and self.check_selection_filter(lookups):
+            return {'f': lookups}
+        return None
+
+    def check_selection_filter(self, lookups):
+        """
+        Check that the filter values are valid for their fields, so the
+        confirmed filter can be applied. The raw values are signed.
+        """
+        queryset = self.get_queryset()
+        opts = queryset.model._meta
+        try:
+            for name, value in lookups.items():
+                try:
+                    field = opts.get_field(name)
+                except FieldDoesNotExist:
+                    # A lookup across relations or with a transform, it's
+                    # checked by the filter below.
+                    continue
+                field.to_python(value)
+            # Field values are prepared when the filter is built.
+            queryset.filter(**lookups)
+        except (ValidationError, ValueError, TypeError):
+            return False
+        return True
+
+    def _selection_binding(self, request):
+        return _request_binding(self, request, '{}.{}'.format(
+            self.__class__.__module__, self.__class__.__name__))
+
+    def make_selection_token(self, request, selection):
+        payload = self._selection_binding(request)
+        payload['s'] = selection
+        return signing.dumps(payload, salt=self.selection_salt,
+                             compress=True)
+
+    def check_selection_token(self, request, token):
+        """
+        Verify the token and return the selection or `None` if it's invalid.
+        """
+        try:
+            payload = signing.loads(token, salt=self.selection_salt,
+                                    max_age=self.selection_max_age)
+        except signing.BadSignature:
+            return None
+        if not _check_binding(payload, self._selection_binding(request)):
+            return None
+        return payload.get('s')
+
+    def get_selection_queryset(self):
+        queryset = self.get_queryset()
+        if 'i' in self.selection:
+            return queryset.filter(pk__in=self.selection['i'])
+        return queryset.filter(**self.selection['f'])
+
+    def process_chunk(self, queryset):
+        """
+        Process the objects of one chunk and return their number.
+        """
+        if self.bulk_operation == 'update':
+            return queryset.update(**self.get_update_values())
+        if self.bulk_operation == 'delete':
+            deleted = queryset.delete()
+            # Django <1.9 returns None.
+            if deleted is None:
+                return None
+            return deleted[1].get(queryset.model._meta.label, 0)
+        raise ImproperlyConfigured(
+            "Unknown bulk operation '{}'.".format(self.bulk_operation))
+
+    def action(self, request):
+        selected = self.get_selection_queryset().order_by('pk')
+        total = None
+        if self.job_id is not None:
+            total = selected.count()
+
+        counts = {'selected': 0, 'processed': 0, 'chunks': 0}
+        last_pk = None
+        while True:
+            # Chunks are selected by the primary key order, so every chunk
+            # is a cheap index range scan.
+            chunk = selected
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            pks = list(chunk.values_list('pk', flat=True)[
+                :self.bulk_chunk_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            with transaction.atomic():
+                processed = self.process_chunk(
+                    self.get_queryset().filter(pk__in=pks))
+            counts['selected'] += len(pks)
+            counts['processed'] += (len(pks) if processed is None
+                                    else processed)
+            counts['chunks'] += 1
+            if total:
+                self.set_job_progress(
+                    min(1.0, float(counts['selected']) / total))
+
+        self.bulk_counts = counts
+        return JsonResponse(counts)
+
+    def get_initial(self):
+        initial = super(BulkConfirmationView, self).get_initial()
+        initial['selection'] = self.selection_token
+        return initial
+
+    def get_context_data(self, **kwargs):
+        context_data = super(BulkConfirmationView, self).get_context_data(
+            **kwargs)
+        context_data['selection_size'] = self.selection_size
+        return context_data
+
+    def yes(self, request, *args, **kwargs):
+        if self.background:
+            return self.submit_action(request)
+        response = self.action(request)
+        if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
+            return response
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get(self, request, *args, **kwargs):
+        selection = self.get_selection(request)
+        if selection is None:
+            return HttpResponseBadRequest()
+        self.selection_token = self.make_selection_token(request, selection)
+        if 'i' in selection:
+            self.selection_size = len(selection['i'])
+        return super(BulkConfirmationView, self).get(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        self.selection = self.check_selection_token(
+            request, request.POST.get('selection', ''))
+        if self.selection is None:
+            return HttpResponseBadRequest()
+        return super(BulkConfirmationView, self).post(request, *args,
+                                                      **kwargs)
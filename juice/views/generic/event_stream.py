@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+A view which pushes messages of `juice.pubsub` channels to clients with
+Server-Sent Events or long polling (requires Python 3, Django >=4.2 and an
+ASGI server).
+"""
+import threading
+import time
+from asyncio import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.views.generic import View
+
+from ... import compat
+from ... import pubsub
+from ...encoders import get_encoder
+from ...http import JsonResponse
+from ..base import JuiceViewMetaclass
+
+
+def _to_async(get_channels):
+    sync_get_channels = sync_to_async(get_channels)
+
+    async def async_get_channels(self, request, *args, **kwargs):
+        return await sync_get_channels(self, request, *args, **kwargs)
+    return async_get_channels
+
+
+def _last_id(request):
+    """
+    Return the id of the last message the client has got: `Last-Event-ID`
+    header sent by a reconnecting `EventSource` or `after` GET parameter.
+    """
+    value = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after')
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class _EventStreamResponse(StreamingHttpResponse):
+    """
+    Calls `on_close` when the server closes the response, even if the
+    stream wasn't iterated (e.g. the client disconnected right away).
+    """
+
+    def __init__(self, streaming_content, on_close):
+        super(_EventStreamResponse, self).__init__(
+            streaming_content, content_type='text/event-stream')
+        self._on_close = on_close
+
+    def close(self):
+        self._on_close()
+        super(_EventStreamResponse, self).close()
+
+
+class EventStreamView(compat.with_metaclass(JuiceViewMetaclass, View)):
+    """
+    An async view which delivers messages published to `juice.pubsub`
+    channels, so pages don't need to poll Ajax endpoints on a timer.
+
+    `get_channels(request, *args, **kwargs)` must return the channels of
+    the client. It can be defined either as `async def` or as an ordinary
+    method, which is run in a thread (so it can use the ORM).
+
+    Requests with `Accept: text/event-stream` (sent by `EventSource`) get a
+    Server-Sent Events stream: every message is an event with the message
+    id, the channel as the event name and the JSON-encoded data. A comment
+    is sent when there were no messages for `heartbeat_interval` seconds, so
+    proxies don't close an idle connection. The stream is closed after
+    `stream_timeout` seconds (if it's set), `EventSource` reconnects
+    sending the last id and gets the retained messages it missed.
+
+    Other requests are long polls: the response is sent as soon as there
+    are messages or after `long_poll_timeout` seconds and contains
+    `{"events": [{"id": ..., "channel": ..., "data": ...}, ...],
+    "last_id": ...}`. The client passes `last_id` as `after` GET parameter
+    of the next poll.
+
+    Every connection buffers at most `max_buffer` undelivered messages; if a
+    client is too slow, the oldest ones are dropped and it gets an
+    `overflow` event (`"overflowed": true` for long polls) to reload the
+    state. At most `max_connections` connections are served by the view
+    class in one process, others get 503 with Retry-After header.
+
+    The view must be served by an ASGI server: under WSGI Django consumes the
+    whole async iterator before sending the response, so an event stream is
+    never delivered (and long polls hold a worker thread).
+
+    Authentication and parameters are handled by the async mixins.
+
+    Example:
+
+        class NotificationsView(AsyncAjaxLoginRequiredMixin,
+                                AsyncGetParamsExtractionMixin,
+                                EventStreamView):
+            get_parameters = [('board_id', 'int')]
+
+            def get_channels(self, request, *args, **kwargs):
+                return ['user.{}'.format(request.user.pk),
+                        'board.{}'.format(self._board_id)]
+
+        # In a sync view, a job, a signal receiver etc.:
+        juice.pubsub.publish('board.42', {'card': 7, 'status': 'done'})
+    """
+
+    http_method_names = ['get']
+
+    heartbeat_interval = 15
+    stream_timeout = None
+    long_poll_timeout = 25
+    max_buffer = 100
+    max_connections = 1000
+    retry_after = 5
+
+    @classmethod
+    def _compile_class(cls):
+        if iscoroutinefunction(cls.get_channels):
+            cls._async_get_channels = cls.get_channels
+        else:
+            cls._async_get_channels = _to_async(cls.get_channels)
+        cls._connections = 0
+        cls._connections_lock = threading.Lock()
+
+    def get_channels(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get_hub(self):
+        return pubsub.get_hub()
+
+    def get_overloaded_response(self):
+        response = HttpResponse("Too many connections.", status=503)
+        response['Retry-After'] = str(self.retry_after)
+        return response
+
+    def _acquire(self):
+        cls = type(self)
+        with cls._connections_lock:
+            if cls._connections >= self.max_connections:
+                return False
+            cls._connections += 1
+            return True
+
+    def _release(self):
+        cls = type(self)
+        with cls._connections_lock:
+            cls._connections -= 1
+
+    async def get(self, request, *args, **kwargs):
+        channels = await self._async_get_channels(request, *args, **kwargs)
+        if not self._acquire():
+            return self.get_overloaded_response()
+        try:
+            hub = self.get_hub()
+            subscription = hub.subscribe(channels, self.max_buffer,
+                                         after=_last_id(request))
+        except BaseException:
+            self._release()
+            raise
+
+        if 'text/event-stream' not in request.META.get('HTTP_ACCEPT', ''):
+            try:
+                messages = await subscription.get(self.long_poll_timeout)
+            finally:
+                hub.unsubscribe(subscription)
+                self._release()
+            return self._long_poll_response(request, messages,
+                                            subscription.overflowed)
+
+        closed = []
+
+        def close():
+            if not closed:
+                closed.append(True)
+                hub.unsubscribe(subscription)
+                self._release()
+
+        response = _EventStreamResponse(self._stream(subscription, close),
+                                        close)
+        response['Cache-Control'] = 'no-cache'
+        # Disable response buffering of nginx.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _long_poll_response(self, request, messages, overflowed):
+        data = {
+            'events': [{'id': m.id, 'channel': m.channel, 'data': m.data}
+                       for m in messages],
+            'last_id': messages[-1].id if messages else _last_id(request),
+        }
+        if overflowed:
+            data['overflowed'] = True
+        return JsonResponse(data, request=request)
+
+    async def _stream(self, subscription, close):
+        dumps = get_encoder().dumps
+        heartbeat_interval = self.heartbeat_interval
+        deadline = None
+        if self.stream_timeout is not None:
+            deadline = time.monotonic() + self.stream_timeout
+        try:
+            while True:
+                timeout = heartbeat_interval
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    timeout = min(timeout, remaining)
+                messages = await subscription.get(timeout)
+                if subscription.overflowed:
+                    yield b'event: overflow\ndata: null\n\n'
+                    return
+                if not messages:
+                    yield b': ping\n\n'
+                    continue
+                yield b''.join(
+                    b'id: %d\nevent: %s\ndata: %s\n\n'
+                    % (m.id, m.channel.encode('utf-8'), dumps(m.data))
+                    for m in messages)
+        finally:
+            close()
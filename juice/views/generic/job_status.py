@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from django.http import Http404
+from django.views.generic import View
+
+from ... import jobs
+from ...http import JsonResponse
+
+
+class JobStatusView(View):
+    """
+    A view which reports the status of a background job submitted by a view
+    with `BackgroundActionMixin` (e.g. `AjaxActionView` with
+    `background = True`).
+
+    The job id is taken from `job_id` url kwarg. The response is JSON
+    `{"id": ..., "status": ..., "progress": ..., "result": ..., "error": ...}`
+    where status is one of 'pending', 'running', 'done' and 'failed'.
+    Unknown jobs and jobs submitted by another user give 404.
+
+    Example:
+
+        # in urls.py
+        url(r'^jobs/(?P<job_id>[0-9a-f]+)/$', JobStatusView.as_view(),
+            name='job-status'),
+
+        class ExportView(AjaxActionView):
+            background = True
+            job_status_url_name = 'job-status'
+    """
+
+    http_method_names = ['get']
+
+    job_backend = None
+
+    def get_job_backend(self):
+        if self.job_backend is not None:
+            return self.job_backend
+        return jobs.get_backend()
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_job_backend().get(kwargs['job_id'])
+        if job is None:
+            raise Http404
+        if job['owner'] is not None and job['owner'] != jobs.get_owner(
+                request):
+            raise Http404
+        return JsonResponse({
+            'id': job['id'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'result': job['result'],
+            'error': job['error'],
+        })
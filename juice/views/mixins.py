@@ -16,16 +16,66 @@ one call to databese even in case of many calls.
 
 `UrlKwargsMixing` - a mixin which extracts required kwargs from the url and
 makes them available inside a view as attributes.
+
+`ConditionalResponseMixin` - a mixin which answers conditional requests with
+304 Not Modified before the view does any real work.
+
+`TimingMixin` - a mixin which records durations of the phases of request
+processing into per view class histograms.
+
+`ConcurrencyLimitMixin` - a mixin which limits the number of concurrently
+executing requests to a view (or a group of views) and sheds the excess
+with 503.
+
+`BackgroundActionMixin` - a mixin which lets the view's `action` be executed
+by a background jobs backend.
+
+`KeysetPaginationMixin` - a mixin which paginates JSON lists by keyset
+(cursor) pagination.
+
+`SparseFieldsetsMixin` - a mixin which lets clients request a subset of
+fields and pushes it down into the queryset.
+
+`QueryBudgetMixin` - a mixin which counts the database queries of a view
+against a declared budget and detects repeated identical queries (N+1).
 """
 from __future__ import unicode_literals
-from types import MethodType
+import logging
+import warnings
+from functools import wraps
+from timeit import default_timer
 
+from django.conf import settings
+from django.core import signing
 from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
 from django.http import HttpResponseForbidden
+from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
-from django.utils import six
+from django.utils.cache import get_conditional_response
+from django.utils.cache import set_response_etag
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
+
+from .base import JuiceViewMetaclass
+from .. import compat
+from .. import concurrency
+from .. import instrumentation
+from .. import jobs
+from .. import queries
+from ..auth import is_authenticated
+from ..http import JsonResponse
+
+try:
+    from django.urls import reverse
+except ImportError:
+    from django.core.urlresolvers import reverse
+
+logger = logging.getLogger(__name__)
 
 
 class EnsureCsrfCookieMixin(object):
@@ -40,12 +90,35 @@ class EnsureCsrfCookieMixin(object):
             # ... class content ...
     """
 
+    @classmethod
+    def _dispatch_decorator(cls):
+        return ensure_csrf_cookie
+
     @method_decorator(ensure_csrf_cookie)
     def dispatch(self, request, *args, **kwargs):
         return super(EnsureCsrfCookieMixin, self).dispatch(
             request, *args, **kwargs)
 
 
+def _cached_auth(view_func):
+    """
+    Wrap a view function which takes the view instance after the request to
+    prime `request.user` from the view's `auth_cache`.
+    """
+    def wrapper(request, view, *args, **kwargs):
+        view.auth_cache.prime(request)
+        return view_func(request, view, *args, **kwargs)
+    return wrapper
+
+
+def _super_login_dispatch(request, view, *args, **kwargs):
+    return super(LoginRequiredMixin, view).dispatch(request, *args, **kwargs)
+
+
+# View class -> the compiled dispatch of `LoginRequiredMixin`.
+_login_dispatches = {}
+
+
 class LoginRequiredMixin(object):
     """
     A view mixin which makes class-based view available only for authenticated
@@ -53,6 +126,14 @@ class LoginRequiredMixin(object):
     The mixin must be the first (the left-most) in view's superclass list
     after EnsureCsrfCookieMixin (if it's used).
 
+    `login_url` and `redirect_field_name` are passed to the decorator
+    (`settings.LOGIN_URL` and 'next' by default).
+
+    `auth_cache` - an optional `juice.auth.SessionUserCache` instance. If
+    it's set, the user id of an authenticated session is cached for a short
+    time and `request.user` is replaced with a lazy `juice.auth.CachedUser`,
+    so the check doesn't load the session and the user.
+
     Example (with EnsureCsrfCookieMixin):
 
         class MyView(EnsureCsrfCookieMixin, LoginRequiredMixin, <other mixins>,
@@ -66,10 +147,31 @@ class LoginRequiredMixin(object):
             # ... class content ...
     """
 
-    @method_decorator(login_required)
+    login_url = None
+    redirect_field_name = REDIRECT_FIELD_NAME
+    auth_cache = None
+
+    @classmethod
+    def _dispatch_decorator(cls):
+        def decorator(view_func):
+            view_func = login_required(
+                view_func, redirect_field_name=cls.redirect_field_name,
+                login_url=cls.login_url)
+            if cls.auth_cache is not None:
+                view_func = _cached_auth(view_func)
+            return view_func
+        return decorator
+
     def dispatch(self, request, *args, **kwargs):
-        return super(LoginRequiredMixin, self).dispatch(
-            request, *args, **kwargs)
+        view_class = type(self)
+        dispatch = _login_dispatches.get(view_class)
+        if dispatch is None:
+            # Bind the mixin's own decorator: `self._dispatch_decorator`
+            # would find the decorator of a mixin to the left in the MRO.
+            decorator = LoginRequiredMixin.__dict__['_dispatch_decorator']
+            dispatch = _login_dispatches[view_class] = (
+                decorator.__get__(None, view_class)()(_super_login_dispatch))
+        return dispatch(request, self, *args, **kwargs)
 
 
 class AjaxLoginRequiredMixin(object):
@@ -79,15 +181,31 @@ class AjaxLoginRequiredMixin(object):
     authenticated.
     The mixin must be the first (the left-most) in view's superclass list.
 
+    `auth_cache` - an optional `juice.auth.SessionUserCache` instance (see
+    `LoginRequiredMixin`).
+
 
     Example:
 
         class MyView(AjaxLoginRequiredMixin, <other mixins>, DetailView):
             # ... class content ...
     """
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated():
+
+    auth_cache = None
+
+    _dispatch_check = '_check_authenticated'
+
+    def _check_authenticated(self, request, *args, **kwargs):
+        if self.auth_cache is not None:
+            self.auth_cache.prime(request)
+        if not is_authenticated(request.user):
             return HttpResponseForbidden()
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        response = self._check_authenticated(request, *args, **kwargs)
+        if response is not None:
+            return response
         return super(AjaxLoginRequiredMixin, self).dispatch(
             request, *args, **kwargs)
 
@@ -108,9 +226,15 @@ class StoreArgsBeforeDispatchMixin(object):
     so this mixin is useless.
     """
 
-    def dispatch(self, request, *args, **kwargs):
+    _dispatch_check = '_store_args'
+
+    def _store_args(self, request, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        self._store_args(request, *args, **kwargs)
         return super(StoreArgsBeforeDispatchMixin, self).dispatch(
             request, *args, **kwargs)
 
@@ -119,16 +243,45 @@ class GetObjectOnceMixin(object):
     """
     A mixin which prevents `get_object` from make more than one call to
     databese even in case of many calls.
+
+    `object_cache` - an optional `juice.cache.ObjectCache` instance. If it's
+    set objects are also cached across requests, keyed by the model and the
+    lookup from the url (`pk_url_kwarg` or `slug_url_kwarg`). Use it only if
+    `get_queryset` doesn't depend on the request (e.g. on the current user).
+    With `SparseFieldsetsMixin` the requested fieldset is a part of the key.
     """
-    
+
+    object_cache = None
+
+    def get_object_cache_lookups(self):
+        """
+        Return the lookup kwargs the object is cached by.
+        """
+        pk = self.kwargs.get(self.pk_url_kwarg, None)
+        if pk is not None:
+            return {'pk': pk}
+        return {self.get_slug_field():
+                self.kwargs.get(self.slug_url_kwarg, None)}
+
     def get_object(self, queryset=None):
         if hasattr(self, 'object'):
             return self.object
 
-        return super(GetObjectOnceMixin, self).get_object(queryset)
+        if self.object_cache is None or queryset is not None:
+            return super(GetObjectOnceMixin, self).get_object(queryset)
+
+        lookups = self.get_object_cache_lookups()
+        get_fields = getattr(self, 'get_fields', None)
+        if get_fields is not None:
+            # Objects with different deferred fields are cached separately.
+            lookups = dict(lookups, _fields=tuple(get_fields()))
+        return self.object_cache.get(
+            self.get_queryset().model,
+            lookups,
+            super(GetObjectOnceMixin, self).get_object)
 
 
-class UrlKwargsMixing(object):
+class UrlKwargsMixing(compat.with_metaclass(JuiceViewMetaclass, object)):
     """
     A view mixin which extracts required kwargs from the url and makes them
     available inside a view as attributes.
@@ -173,53 +326,933 @@ class UrlKwargsMixing(object):
     url_kwargs_mandatory = True
     url_kwargs_on_attr_collision = 'raise'
 
-
-    def __init__(self, *args, **kwargs):
+    @classmethod
+    def _compile_class(cls):
+        """
+        Validate the configuration and compile the normalized list of kwargs
+        into a tuple shared by all instances of the class.
+        """
         # Check configuration.
-        if self.url_kwargs_on_attr_collision not in ['raise', 'overwrite']:
+        if cls.url_kwargs_on_attr_collision not in ['raise', 'overwrite']:
             msg = ("Unknown attribute collision behaviour '{}'. "
                    "Use 'raise' or 'overwrite'."
-                   .format(self.url_kwargs_on_attr_collision))
-            raise ImproperlyConfigured(msg)            
+                   .format(cls.url_kwargs_on_attr_collision))
+            raise ImproperlyConfigured(msg)
+
+        # Normalize kwargs - convert strings into tuples.
+        normalized_kwargs = []
+        for el in cls.url_kwargs:
+            if isinstance(el, compat.string_types):
+                normalized_kwargs.append((el, '_'+el, ))
+            else:
+                kwarg, attr_name = el
+                normalized_kwargs.append((kwarg, attr_name, ))
+
+        cls._url_kwargs_plan = (
+            tuple(normalized_kwargs),
+            bool(cls.url_kwargs_mandatory),
+            cls.url_kwargs_on_attr_collision == 'raise')
 
-        # Define two processing strategies - for 'raise' and for 'overwrite'.
-        req_msg_tpl = "Keyword argument '{}' is required but not provided."
+    _dispatch_check = '_extract_url_kwargs'
 
-        def raise_strategy(self, kwarg, kwargs, attr_name):
+    def _extract_url_kwargs(self, request, *args, **kwargs):
+        plan, mandatory, check_collision = self._url_kwargs_plan
+        for kwarg, attr_name in plan:
             if kwarg not in kwargs:
-                if self.url_kwargs_required:
-                    raise TypeError(req_msg_tpl.format(kwarg))
-                return
-            if hasattr(self, attr_name):
+                if mandatory:
+                    raise TypeError(
+                        "Keyword argument '{}' is required but not provided."
+                        .format(kwarg))
+                continue
+            if check_collision and hasattr(self, attr_name):
                 raise ImproperlyConfigured(
                     "Attribute '{}' is alreay exists.".format(attr_name))
             setattr(self, attr_name, kwargs[kwarg])
+        return None
 
-        def overwrite_strategy(self, kwarg, kwargs, attr_name):
-            if kwarg not in kwargs:
-                if self.url_kwargs_required:
-                    raise TypeError(req_msg_tpl.format(kwarg))
-                return
-            setattr(self, attr_name, kwargs[kwarg])
+    def dispatch(self, request, *args, **kwargs):
+        self._extract_url_kwargs(request, *args, **kwargs)
+        return super(UrlKwargsMixing, self).dispatch(request, *args, **kwargs)
 
-        # Choose processing strategy.
-        fname = self.url_kwargs_on_attr_collision + '_strategy'
-        self.__process = MethodType(locals()[fname], self)
 
-        # Normalize kwargs - convert strings into tuples.
-        normalized_kwargs = []
-        for el in self.url_kwargs:
-            if isinstance(el, six.string_types):
-                normalized_kwargs.append((el, '_'+el, ))
-            else:
-                normalized_kwargs.append(el)
-        self.url_kwargs = normalized_kwargs
+def _get_view_etag(request, view, *args, **kwargs):
+    return view.get_etag(request, *args, **kwargs)
+
+
+def _get_view_last_modified(request, view, *args, **kwargs):
+    return view.get_last_modified(request, *args, **kwargs)
+
+
+def _conditional(view_func):
+    """
+    Wrap a view function which takes the view instance after the request with
+    Django's `condition` decorator and the content hash ETag check.
+    """
+    conditional_func = condition(
+        etag_func=_get_view_etag,
+        last_modified_func=_get_view_last_modified)(view_func)
+
+    def wrapper(request, view, *args, **kwargs):
+        response = conditional_func(request, view, *args, **kwargs)
+        if (not view.etag_from_content or
+                request.method not in ('GET', 'HEAD') or
+                response.status_code != 200 or
+                response.streaming):
+            return response
+
+        def set_content_etag(response):
+            if response.has_header('ETag'):
+                return response
+            set_response_etag(response)
+            if not response.has_header('ETag'):
+                # Empty content doesn't get ETag.
+                return response
+            return get_conditional_response(
+                request, etag=response['ETag'], response=response)
 
-        super(UrlKwargsMixing, self).__init__(*args, **kwargs)
+        # The content of a template response is available only after it's
+        # rendered; the response returned by a post-render callback
+        # replaces it (so 304 can be returned).
+        if getattr(response, 'is_rendered', True) is False:
+            response.add_post_render_callback(set_content_etag)
+            return response
+        return set_content_etag(response)
+    return wrapper
 
 
+def _super_dispatch(request, view, *args, **kwargs):
+    return super(ConditionalResponseMixin, view).dispatch(
+        request, *args, **kwargs)
+
+
+_conditional_dispatch = _conditional(_super_dispatch)
+
+
+class ConditionalResponseMixin(object):
+    """
+    A view mixin which answers `If-None-Match` and `If-Modified-Since`
+    requests with 304 Not Modified before the view does any real work
+    (`get_object`, serialization, template rendering).
+
+    The mixin's behaviour is determined by the following attributes and
+    methods.
+
+    `last_modified_field` - the name of a model field (e.g. `updated_at`)
+    which is used as Last-Modified validator. Its value is fetched with a
+    narrow `values_list` query on `get_queryset()` filtered by the object
+    lookup from the url (`pk_url_kwarg` or `slug_url_kwarg`), so the mixin
+    is intended for single object views (`DetailView` and alike).
+
+    `etag_from_content` - if it's set to `True` the response without ETag
+    gets one computed as a hash of its content and 304 is returned in case
+    it matches `If-None-Match`. It doesn't save the work on the server but
+    saves the bandwidth.
+
+    `get_etag(request, *args, **kwargs)` and
+    `get_last_modified(request, *args, **kwargs)` - methods which return
+    the validators; override them to use some other cheap validator.
+
+    Example:
+
+        class EntryView(ConditionalResponseMixin, GetObjectOnceMixin,
+                        DetailView):
+            model = Entry
+            last_modified_field = 'updated_at'
+    """
+
+    last_modified_field = None
+    etag_from_content = False
+
+    @classmethod
+    def _dispatch_decorator(cls):
+        return _conditional
+
+    def get_validator_queryset(self, **kwargs):
+        """
+        Return the queryset narrowed to the object looked up by the url
+        kwargs.
+        """
+        queryset = self.get_queryset()
+        pk = kwargs.get(self.pk_url_kwarg, None)
+        slug = kwargs.get(self.slug_url_kwarg, None)
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        if slug is not None:
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        return queryset
+
+    def get_etag(self, request, *args, **kwargs):
+        return None
+
+    def get_last_modified(self, request, *args, **kwargs):
+        if self.last_modified_field is None:
+            return None
+        values = self.get_validator_queryset(**kwargs).values_list(
+            self.last_modified_field, flat=True)[:1]
+        for value in values:
+            return value
+        return None
+
     def dispatch(self, request, *args, **kwargs):
-        for kwarg, attr_name in self.url_kwargs:
-            self.__process(kwarg, kwargs, attr_name)
+        return _conditional_dispatch(request, self, *args, **kwargs)
 
-        return super(UrlKwargsMixing, self).dispatch(request, *args, **kwargs)
+
+def _timed_method(phase, method):
+    """
+    Wrap a view method to record its duration as `phase`. Nested calls of
+    the same phase (e.g. via `super`) are recorded once.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        phases = self._timing_phases
+        if phases is None or phase in phases:
+            return method(self, *args, **kwargs)
+        phases.add(phase)
+        start = default_timer()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            instrumentation.record(phase, default_timer() - start,
+                                   self._timing_name)
+            phases.discard(phase)
+    wrapper._juice_timed = True
+    return wrapper
+
+
+def _timed_handler(method):
+    """
+    Wrap an HTTP method handler to record its duration as 'handler' and the
+    time spent in the dispatch chain before it as 'checks'.
+    """
+    timed = _timed_method('handler', method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        phases = self._timing_phases
+        if phases is not None and 'handler' not in phases:
+            instrumentation.record('checks',
+                                   default_timer() - self._timing_start,
+                                   self._timing_name)
+        return timed(self, *args, **kwargs)
+    wrapper._juice_timed = True
+    return wrapper
+
+
+def _timed(view_func):
+    """
+    Wrap a view function which takes the view instance after the request to
+    record the duration of the whole dispatch and of the lazy rendering.
+    """
+    def wrapper(request, view, *args, **kwargs):
+        name = view._timing_name
+        previous = instrumentation.active_view()
+        instrumentation.activate(name)
+        view._timing_phases = set()
+        view._timing_start = start = default_timer()
+        try:
+            response = view_func(request, view, *args, **kwargs)
+        finally:
+            end = default_timer()
+            instrumentation.record('dispatch', end - start, name)
+            instrumentation.activate(previous)
+            view._timing_phases = None
+
+        if getattr(response, 'is_rendered', True) is False:
+            def record_render(response):
+                instrumentation.record('render', default_timer() - end, name)
+            response.add_post_render_callback(record_render)
+        return response
+    return wrapper
+
+
+def _super_timed_dispatch(request, view, *args, **kwargs):
+    return super(TimingMixin, view).dispatch(request, *args, **kwargs)
+
+
+_timed_dispatch = _timed(_super_timed_dispatch)
+
+
+class TimingMixin(compat.with_metaclass(JuiceViewMetaclass, object)):
+    """
+    A view mixin which records durations of the phases of request processing
+    into per view class histograms (see `juice.instrumentation`).
+
+    The phases are:
+        * `dispatch` - the whole dispatch;
+        * `checks` - the part of the dispatch chain before the HTTP method
+          handler (CSRF cookie, authentication, url kwargs and parameters
+          extraction etc.);
+        * the checks of juice mixins separately: `check_authenticated`,
+          `extract_url_kwargs`, `extract_params` etc.;
+        * `handler` - the HTTP method handler (`get`, `post` etc.);
+        * `get_object` and `action`;
+        * `encode` - encoding of `JsonResponse`;
+        * `render` - lazy rendering of a template response (with template
+          response middleware).
+
+    The methods are wrapped once, when the class is created. The mixin must
+    be the first (the left-most) in view's superclass list. It's intended
+    for sync views only.
+    The stats are available via `juice.instrumentation.get_stats` and
+    `juice_timings` management command.
+
+    Example:
+
+        class MyView(TimingMixin, LoginRequiredMixin, <other mixins>,
+                     DetailView):
+            # ... class content ...
+    """
+
+    _timing_phases = None
+    _timing_start = None
+
+    @classmethod
+    def _compile_class(cls):
+        cls._timing_name = '{}.{}'.format(cls.__module__, cls.__name__)
+
+        methods = [('get_object', 'get_object'), ('action', 'action')]
+        for klass in cls.__mro__:
+            check = klass.__dict__.get('_dispatch_check')
+            if check is not None:
+                methods.append((check, check.lstrip('_')))
+
+        for name, phase in methods:
+            method = getattr(cls, name, None)
+            if method is not None and not hasattr(method, '_juice_timed'):
+                setattr(cls, name, _timed_method(phase, method))
+
+        for name in getattr(cls, 'http_method_names', ()):
+            method = getattr(cls, name, None)
+            if method is not None and not hasattr(method, '_juice_timed'):
+                setattr(cls, name, _timed_handler(method))
+
+    @classmethod
+    def _dispatch_decorator(cls):
+        return _timed
+
+    def dispatch(self, request, *args, **kwargs):
+        return _timed_dispatch(request, self, *args, **kwargs)
+
+
+def _limited(view_func):
+    """
+    Wrap a view function which takes the view instance after the request to
+    hold a slot of the view's concurrency limiter during its execution.
+    """
+    def wrapper(request, view, *args, **kwargs):
+        limiter = view._concurrency_limiter
+        token = limiter.acquire(view.concurrency_wait,
+                                view.concurrency_max_queue)
+        if token is None:
+            return view.get_overloaded_response(request)
+        try:
+            return view_func(request, view, *args, **kwargs)
+        finally:
+            limiter.release(token)
+    return wrapper
+
+
+def _super_limited_dispatch(request, view, *args, **kwargs):
+    return super(ConcurrencyLimitMixin, view).dispatch(
+        request, *args, **kwargs)
+
+
+_limited_dispatch = _limited(_super_limited_dispatch)
+
+
+class ConcurrencyLimitMixin(compat.with_metaclass(JuiceViewMetaclass, object)):
+    """
+    A view mixin which limits the number of concurrently executing requests,
+    so an expensive view can't occupy all workers.
+
+    The mixin's behaviour is determined by the following attributes.
+
+    `concurrency_limit` - the maximum number of concurrent requests.
+
+    `concurrency_group` - the name of the limit. Views with the same group
+    share one limit (they must have the same `concurrency_limit`). By default
+    every view class has its own limit.
+
+    `concurrency_wait` - how long (in seconds) a request waits for a free slot
+    before it's shed (0 by default - shed immediately).
+
+    `concurrency_max_queue` - the maximum number of waiting requests, the
+    excess is shed immediately (`None` by default - unbounded).
+
+    `concurrency_lock_dir` - if it's set the limit is shared by all processes
+    on the host via file locks in this directory (see
+    `juice.concurrency.FileLimiter`). Otherwise the limit is per process.
+
+    `concurrency_retry_after` - the value of `Retry-After` header of the 503
+    response (in seconds). Override `get_overloaded_response` to return
+    something else.
+
+    The counters of admitted, queued and shed requests are returned by
+    `get_concurrency_stats` classmethod and, for all groups, by
+    `juice.concurrency.get_stats`.
+
+    The mixin should be the first (the left-most) in view's superclass list,
+    so the requests are shed before any work is done. The slot is held while
+    the view is dispatched; lazy rendering and streaming happen after it's
+    released.
+
+    Example:
+
+        class ExportView(ConcurrencyLimitMixin, LoginRequiredMixin,
+                         AjaxActionView):
+            concurrency_limit = 2
+            concurrency_group = 'exports'
+            concurrency_wait = 0.5
+    """
+
+    concurrency_limit = None
+    concurrency_group = None
+    concurrency_wait = 0
+    concurrency_max_queue = None
+    concurrency_lock_dir = None
+    concurrency_retry_after = 1
+
+    @classmethod
+    def _compile_class(cls):
+        if cls.concurrency_limit is None:
+            cls._concurrency_limiter = None
+            return
+        if (not isinstance(cls.concurrency_limit, compat.integer_types) or
+                cls.concurrency_limit <= 0):
+            raise ImproperlyConfigured(
+                "Attribute 'concurrency_limit' must be a positive integer.")
+        group = cls.concurrency_group or '{}.{}'.format(cls.__module__,
+                                                       cls.__name__)
+        cls._concurrency_limiter = concurrency.get_limiter(
+            group, cls.concurrency_limit, cls.concurrency_lock_dir)
+
+    @classmethod
+    def get_concurrency_stats(cls):
+        """
+        Return a dictionary with the counters of the view's limiter.
+        """
+        return cls._concurrency_limiter.stats()
+
+    def __init__(self, *args, **kwargs):
+        super(ConcurrencyLimitMixin, self).__init__(*args, **kwargs)
+
+        if self._concurrency_limiter is None:
+            raise ImproperlyConfigured(
+                "Attribute 'concurrency_limit' is required.")
+
+    def get_overloaded_response(self, request):
+        response = HttpResponse(status=503)
+        response['Retry-After'] = compat.text_type(
+            self.concurrency_retry_after)
+        return response
+
+    @classmethod
+    def _dispatch_decorator(cls):
+        return _limited
+
+    def dispatch(self, request, *args, **kwargs):
+        return _limited_dispatch(request, self, *args, **kwargs)
+
+
+class BackgroundActionMixin(object):
+    """
+    A mixin for views with `action(request)` method (`AjaxActionView`,
+    `ConfirmationView`) which lets the action be executed in the background,
+    so slow actions don't hold a worker.
+
+    If `background` is `True` the action is submitted to the jobs backend
+    (`job_backend` attribute or the backend configured by
+    `JUICE_JOBS_BACKEND` setting, see `juice.jobs`) and the view immediately
+    returns 202 with `{"job_id": ...}` JSON. If `job_status_url_name` is set
+    (the url name of a `JobStatusView` with `job_id` kwarg) the response
+    also contains `status_url` and `Location` header. If the backend's queue
+    is full the response is 503 with `Retry-After`.
+
+    The action is called with the original request in a worker thread after
+    the response is returned. It can report its progress with
+    `set_job_progress(progress)` (a number from 0 to 1). The result of the
+    job is the `data` of the `JsonResponse` returned by the action (other
+    return values are ignored).
+    """
+
+    background = False
+    job_backend = None
+    job_status_url_name = None
+    job_id = None
+
+    def get_job_backend(self):
+        if self.job_backend is not None:
+            return self.job_backend
+        return jobs.get_backend()
+
+    def submit_action(self, request):
+        """
+        Submit the action to the jobs backend and return the response.
+        """
+        def run(job_id):
+            self.job_id = job_id
+            return getattr(self.action(request), 'data', None)
+
+        try:
+            job_id = self.get_job_backend().submit(
+                run, owner=jobs.get_owner(request))
+        except jobs.JobQueueFull:
+            response = HttpResponse(status=503)
+            response['Retry-After'] = '1'
+            return response
+        return self.get_job_response(request, job_id)
+
+    def get_job_response(self, request, job_id):
+        data = {'job_id': job_id}
+        url = None
+        if self.job_status_url_name is not None:
+            url = data['status_url'] = reverse(self.job_status_url_name,
+                                               kwargs={'job_id': job_id})
+        response = JsonResponse(data)
+        response.status_code = 202
+        if url is not None:
+            response['Location'] = url
+        return response
+
+    def set_job_progress(self, progress):
+        """
+        Report the progress of the action executed in the background.
+        """
+        if self.job_id is not None:
+            self.get_job_backend().set_progress(self.job_id, progress)
+
+
+def _encode_cursor_value(value):
+    if value is None or isinstance(
+            value, (bool, float) + compat.integer_types + compat.string_types):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return compat.text_type(value)
+
+
+class KeysetPaginationMixin(compat.with_metaclass(JuiceViewMetaclass, object)):
+    """
+    A view mixin which paginates a queryset by keyset (cursor) pagination:
+    a page is selected by a `WHERE` condition on the ordering fields
+    instead of `OFFSET`, so deep pages cost the same as the first one.
+
+    The mixin's behaviour is determined by the following attributes.
+
+    `keyset_ordering` - the ordering of the list, e.g.
+    `('-created_at', 'pk')`. It must select the rows unambiguously, so 'pk'
+    is appended if the last field isn't 'pk' or 'id'. The fields must be
+    non-nullable fields of the model itself (not lookups across relations).
+
+    `page_size` and `max_page_size` - the default and the maximum number of
+    items on a page (20 and 100).
+
+    `cursor_param_name`, `page_size_param_name` and `count_param_name` -
+    the names of GET parameters ('cursor', 'limit' and 'count'). The
+    parameters can be declared in `get_parameters` of
+    `GetParamsExtractionMixin`, e.g.
+    `[('cursor', 'cursor'), ('limit', 'int', {'default': 20})]`; otherwise
+    they are read from `request.GET`. An invalid cursor gives 400.
+
+    `keyset_allow_count` - if it's `True` (default) and the request has
+    `count=true` the response contains the total count (`COUNT(*)` isn't
+    executed otherwise).
+
+    Cursors are opaque strings signed with `cursor_salt` (by default the
+    dotted name of the view class), they contain the values of the ordering
+    fields of the first or the last item of a page and the direction.
+
+    `get_paginated_response(queryset, serialize=None)` returns
+    `JsonResponse` with `{"results": [...], "next": <cursor>, "previous":
+    <cursor>}` (and "count" if requested). `serialize` converts an item to a
+    JSON-serializable value, by default items are used as is (e.g. rows of
+    `values()` which must include the ordering fields).
+
+    Example:
+
+        class EntryListView(KeysetPaginationMixin, GetParamsExtractionMixin,
+                            View):
+            keyset_ordering = ('-published', 'pk')
+            get_parameters = [('cursor', 'cursor'),
+                              ('limit', 'int', {'default': 20})]
+
+            def get(self, request, *args, **kwargs):
+                return self.get_paginated_response(
+                    Entry.objects.values('id', 'title', 'published'))
+    """
+
+    keyset_ordering = None
+    page_size = 20
+    max_page_size = 100
+    cursor_param_name = 'cursor'
+    page_size_param_name = 'limit'
+    count_param_name = 'count'
+    keyset_allow_count = True
+    cursor_salt = None
+
+    @classmethod
+    def _compile_class(cls):
+        if cls.keyset_ordering is None:
+            cls._keyset_fields = None
+            return
+        fields = []
+        for field in cls.keyset_ordering:
+            if field.startswith('-'):
+                fields.append((field[1:], True))
+            else:
+                fields.append((field, False))
+        if not fields:
+            raise ImproperlyConfigured(
+                "Attribute 'keyset_ordering' must not be empty.")
+        if fields[-1][0] not in ('pk', 'id'):
+            fields.append(('pk', False))
+        cls._keyset_fields = tuple(fields)
+        if cls.cursor_salt is None:
+            cls.cursor_salt = 'juice.keyset.{}.{}'.format(cls.__module__,
+                                                          cls.__name__)
+
+    def __init__(self, *args, **kwargs):
+        super(KeysetPaginationMixin, self).__init__(*args, **kwargs)
+
+        if self._keyset_fields is None:
+            raise ImproperlyConfigured(
+                "Attribute 'keyset_ordering' is required.")
+
+    def encode_cursor(self, values, previous):
+        return signing.dumps(
+            {'v': [_encode_cursor_value(v) for v in values],
+             'p': previous},
+            salt=self.cursor_salt, compress=True)
+
+    def decode_cursor(self, value):
+        """
+        Return `(values, previous)` decoded from the cursor. Raise
+        `ValueError` if it's invalid.
+        """
+        try:
+            payload = signing.loads(value, salt=self.cursor_salt)
+        except signing.BadSignature:
+            raise ValueError("Bad cursor.")
+        values = payload.get('v')
+        if (not isinstance(values, list) or
+                len(values) != len(self._keyset_fields)):
+            raise ValueError("Bad cursor.")
+        return values, bool(payload.get('p'))
+
+    def get_cursor(self):
+        attr_name = '_' + self.cursor_param_name
+        if hasattr(self, attr_name):
+            return getattr(self, attr_name)
+        value = self.request.GET.get(self.cursor_param_name, None)
+        if not value:
+            return None
+        return self.decode_cursor(value)
+
+    def get_page_size(self):
+        attr_name = '_' + self.page_size_param_name
+        if hasattr(self, attr_name):
+            size = getattr(self, attr_name)
+        else:
+            try:
+                size = int(self.request.GET.get(self.page_size_param_name,
+                                                self.page_size))
+            except ValueError:
+                size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _keyset_condition(self, fields, values, backward):
+        """
+        Return the `Q` selecting the rows after (or before, if `backward`)
+        the row with `values` of `fields`.
+        """
+        condition = Q()
+        for i, (field, descending) in enumerate(fields):
+            lookup = 'lt' if descending != backward else 'gt'
+            term = Q(**{'{}__{}'.format(field, lookup): values[i]})
+            for j in range(i):
+                term &= Q(**{fields[j][0]: values[j]})
+            condition |= term
+        return condition
+
+    def paginate_keyset(self, queryset):
+        """
+        Return the items of the requested page and the cursors of the next
+        and the previous pages (or `None`). Raise `ValueError` if the cursor
+        is invalid.
+        """
+        pk_name = queryset.model._meta.pk.attname
+        fields = [(pk_name if field == 'pk' else field, descending)
+                  for field, descending in self._keyset_fields]
+        cursor = self.get_cursor()
+        size = self.get_page_size()
+        backward = cursor is not None and cursor[1]
+
+        order_by = ['-' + field if descending != backward else field
+                    for field, descending in fields]
+        queryset = queryset.order_by(*order_by)
+        if cursor is not None:
+            values = []
+            for (field, _), value in zip(fields, cursor[0]):
+                model_field = queryset.model._meta.get_field(field)
+                try:
+                    values.append(model_field.to_python(value))
+                except ValidationError:
+                    raise ValueError("Bad cursor.")
+            queryset = queryset.filter(
+                self._keyset_condition(fields, values, backward))
+
+        items = list(queryset[:size + 1])
+        has_more = len(items) > size
+        items = items[:size]
+        if backward:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        def key(item):
+            if isinstance(item, dict):
+                return [item[field] for field, _ in fields]
+            return [getattr(item, field) for field, _ in fields]
+
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = self.encode_cursor(key(items[-1]), False)
+        if items and has_previous:
+            previous_cursor = self.encode_cursor(key(items[0]), True)
+        return items, next_cursor, previous_cursor
+
+    def get_paginated_response(self, queryset, serialize=None):
+        try:
+            items, next_cursor, previous_cursor = self.paginate_keyset(
+                queryset)
+        except ValueError:
+            return HttpResponseBadRequest("Bad cursor.")
+        if serialize is not None:
+            items = [serialize(item) for item in items]
+        data = {
+            'results': items,
+            'next': next_cursor,
+            'previous': previous_cursor,
+        }
+        if (self.keyset_allow_count and
+                self.request.GET.get(self.count_param_name) == 'true'):
+            data['count'] = queryset.count()
+        return JsonResponse(data, request=self.request)
+
+
+class SparseFieldsetsMixin(object):
+    """
+    A view mixin which lets clients request only some fields of the objects
+    (e.g. `?fields=id,title`) and pushes the fieldset down into the queryset,
+    so the other columns aren't fetched, instantiated and encoded.
+
+    The mixin's behaviour is determined by the following attributes.
+
+    `sparse_fields` - the whitelist of the fields which can be requested
+    (names of concrete model fields).
+
+    `default_fields` - the fields used if the request doesn't specify them
+    (all of `sparse_fields` by default).
+
+    `fields_param_name` - the name of the parameter ('fields' by default).
+    It must be declared in `get_parameters` of `GetParamsExtractionMixin`
+    as `('fields', 'fields')`; unknown fields give 400.
+
+    `get_queryset` applies `.only()` with the fieldset to the queryset of
+    the parent class, so `get_object` (including `GetObjectOnceMixin`'s)
+    fetches only the requested columns. `get_values(queryset)` returns
+    `.values()` of the fieldset for lists and `serialize_fields(obj)` returns
+    a dictionary of the fieldset of an object for `JsonResponse`.
+
+    Example:
+
+        class EntryView(SparseFieldsetsMixin, GetParamsExtractionMixin,
+                        GetObjectOnceMixin, DetailView):
+            model = Entry
+            sparse_fields = ('id', 'title', 'body', 'published')
+            default_fields = ('id', 'title')
+            get_parameters = [('fields', 'fields')]
+
+            def get(self, request, *args, **kwargs):
+                return JsonResponse(self.serialize_fields(self.get_object()))
+    """
+
+    sparse_fields = ()
+    default_fields = None
+    fields_param_name = 'fields'
+
+    def clean_fields(self, names):
+        """
+        Return a tuple of the unique requested fields. Raise `ValueError` if
+        some field isn't in `sparse_fields`.
+        """
+        fields = []
+        for name in names:
+            if name not in self.sparse_fields:
+                raise ValueError("Unknown field '{}'.".format(name))
+            if name not in fields:
+                fields.append(name)
+        return tuple(fields)
+
+    def get_fields(self):
+        """
+        Return the fieldset of the request.
+        """
+        fields = getattr(self, '_' + self.fields_param_name, None)
+        if fields is not None:
+            return fields
+        if self.default_fields is not None:
+            return tuple(self.default_fields)
+        return tuple(self.sparse_fields)
+
+    def get_queryset(self):
+        queryset = super(SparseFieldsetsMixin, self).get_queryset()
+        return queryset.only(*self.get_fields())
+
+    def get_values(self, queryset):
+        return queryset.values(*self.get_fields())
+
+    def serialize_fields(self, obj):
+        return dict((name, getattr(obj, name)) for name in self.get_fields())
+
+
+def _budgeted(view_func):
+    """
+    Wrap a view function which takes the view instance after the request to
+    record the queries of the dispatch and of the lazy rendering and check
+    them against the view's budget.
+    """
+    def wrapper(request, view, *args, **kwargs):
+        using = view.query_budget_databases
+        recorder = queries.QueryRecorder(view._query_duplicate_threshold)
+        with recorder.install(using):
+            response = view_func(request, view, *args, **kwargs)
+
+        if getattr(response, 'is_rendered', True) is not False:
+            view.check_query_budget(request, recorder)
+            return response
+
+        render = response.render
+
+        def recorded_render():
+            # Drop the instance attribute, so the response can be pickled
+            # (e.g. by the cache middleware).
+            del response.render
+            with recorder.install(using):
+                rendered = render()
+            view.check_query_budget(request, recorder)
+            return rendered
+        response.render = recorded_render
+        return response
+    return wrapper
+
+
+def _super_budgeted_dispatch(request, view, *args, **kwargs):
+    return super(QueryBudgetMixin, view).dispatch(request, *args, **kwargs)
+
+
+_budgeted_dispatch = _budgeted(_super_budgeted_dispatch)
+
+
+class QueryBudgetMixin(compat.with_metaclass(JuiceViewMetaclass, object)):
+    """
+    A view mixin which counts the database queries executed while the view
+    is dispatched (the mixins' checks, `get_object`, `action` etc.) and its
+    lazy response is rendered, and checks them (requires Django >=2.0).
+
+    The mixin's behaviour is determined by the following attributes.
+
+    `query_budget` - the maximum number of queries (`None` by default - not
+    limited).
+
+    `query_repeat_limit` - the maximum number of executions of structurally
+    identical queries (the same SQL with different values). More executions
+    usually mean an N+1 problem: a query per object of a list instead of
+    `select_related`/`prefetch_related` or one query with `IN`. The call
+    sites of the repeated queries are reported. 3 by default, `None`
+    disables the check.
+
+    `query_budget_action` - what to do when the checks fail: 'log' a warning
+    to `juice.views.mixins` logger, issue a `juice.queries.QueryBudgetWarning`
+    ('warn') or raise `juice.queries.QueryBudgetExceeded` ('raise'), e.g. to
+    fail tests. By default it's taken from `JUICE_QUERY_BUDGET_ACTION`
+    setting ('log' if it isn't set). Override `query_budget_exceeded` to do
+    something else.
+
+    `query_budget_databases` - the aliases of the databases to count the
+    queries of (`None` by default - all databases).
+
+    The mixin should be the first (the left-most) in view's superclass list,
+    so the queries of the other mixins are counted too. Responses which
+    aren't rendered by the request handler (e.g. `TemplateResponse` returned
+    by a view called directly) aren't checked.
+
+    Example:
+
+        class EntryListView(QueryBudgetMixin, LoginRequiredMixin, ListView):
+            query_budget = 5
+            query_repeat_limit = 1
+    """
+
+    query_budget = None
+    query_repeat_limit = 3
+    query_budget_action = None
+    query_budget_databases = None
+
+    _query_budget_actions = ('log', 'warn', 'raise')
+
+    @classmethod
+    def _compile_class(cls):
+        if (cls.query_budget_action is not None and
+                cls.query_budget_action not in cls._query_budget_actions):
+            raise ImproperlyConfigured(
+                "Attribute 'query_budget_action' must be one of {}."
+                .format(', '.join(cls._query_budget_actions)))
+        if cls.query_repeat_limit is None:
+            cls._query_duplicate_threshold = None
+        else:
+            cls._query_duplicate_threshold = cls.query_repeat_limit + 1
+        cls._query_budget_name = '{}.{}'.format(cls.__module__, cls.__name__)
+
+    def check_query_budget(self, request, recorder):
+        """
+        Check the queries recorded by `recorder` (a
+        `juice.queries.QueryRecorder`) and call `query_budget_exceeded` with
+        the description of the problems if there are any.
+        """
+        problems = []
+        budget = self.query_budget
+        if budget is not None and recorder.count > budget:
+            problems.append("{} queries, the budget is {}".format(
+                recorder.count, budget))
+        for sql, count, sites in recorder.duplicates():
+            problems.append("{} executions of '{}' at {}".format(
+                count, sql, ', '.join(sites) or 'unknown location'))
+        if problems:
+            self.query_budget_exceeded(
+                request, "{} ({} {}): {}".format(
+                    self._query_budget_name, request.method,
+                    request.path, '; '.join(problems)))
+
+    def query_budget_exceeded(self, request, message):
+        action = self.query_budget_action
+        if action is None:
+            action = getattr(settings, 'JUICE_QUERY_BUDGET_ACTION', 'log')
+        if action == 'raise':
+            raise queries.QueryBudgetExceeded(message)
+        elif action == 'warn':
+            warnings.warn(message, queries.QueryBudgetWarning)
+        elif action == 'log':
+            logger.warning("Query budget exceeded: %s", message)
+        else:
+            raise ImproperlyConfigured(
+                "JUICE_QUERY_BUDGET_ACTION must be one of {}."
+                .format(', '.join(self._query_budget_actions)))
+
+    @classmethod
+    def _dispatch_decorator(cls):
+        return _budgeted
+
+    def dispatch(self, request, *args, **kwargs):
+        return _budgeted_dispatch(request, self, *args, **kwargs)
@@ -34,7 +34,11 @@ setup(
     maintainer_email=MAINTAINER_EMAIL,
     url=URL,
     license="MIT License",
-    packages=["juice"],
+    packages=["juice",
+              "juice.views",
+              "juice.views.generic",
+              "juice.management",
+              "juice.management.commands"],
     zip_safe=False,
     install_requires=[],
     include_package_data=True,
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of django-juice.
+
+Run from the repository root:
+
+    python -m pytest tests
+    python -m unittest discover -t . -s tests
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+
+# The in-memory database lives as long as the process.
+call_command('migrate', run_syncdb=True, verbosity=0)
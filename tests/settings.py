@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal Django settings for the tests (in-memory SQLite).
+"""
+
+SECRET_KEY = 'tests'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+ROOT_URLCONF = 'tests.urls'
+LOGIN_URL = '/login/'
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'django.contrib.auth',
+    'django.contrib.sessions',
+    'juice',
+    'tests',
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+
+USE_TZ = True
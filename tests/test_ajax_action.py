@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import json
+
+from django.test import RequestFactory
+from django.test import SimpleTestCase
+from django.test import TestCase
+
+from juice.http import JsonResponse
+from juice.views.generic import AjaxActionView
+from juice.views.generic import BatchAjaxActionView
+
+
+class _EchoView(AjaxActionView):
+    post_parameters = ['name']
+
+    def action(self, request):
+        return JsonResponse({'name': self._name})
+
+
+class _CoalescingView(AjaxActionView):
+    coalesce = True
+    post_parameters = [('n', 'int')]
+
+
+class _BatchEchoView(BatchAjaxActionView):
+    post_parameters = ['name']
+
+    def action(self, request):
+        return JsonResponse({'name': self._name})
+
+
+class AjaxActionViewTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def post(self, view_class, data, ajax=True):
+        extra = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if ajax else {}
+        request = self.factory.post('/', data, **extra)
+        return view_class.as_view()(request)
+
+    def test_action(self):
+        response = self.post(_EchoView, {'name': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'name': 'x'})
+
+    def test_not_ajax_request(self):
+        self.assertEqual(self.post(_EchoView, {'name': 'x'}, ajax=False)
+                         .status_code, 400)
+        self.assertEqual(
+            self.post(_BatchEchoView, {'batch': '[]'}, ajax=False)
+            .status_code, 400)
+
+    def test_batch_null_is_missing_parameter(self):
+        batch = [{'name': None}, {'name': 'x'}]
+        response = self.post(_BatchEchoView, {'batch': json.dumps(batch)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [
+            {'status': 400, 'error': "Bad parameters."},
+            {'status': 200, 'data': {'name': 'x'}},
+        ])
+
+    def test_batch_null_in_list_is_malformed(self):
+        batch = [{'name': ['x', None]}]
+        response = self.post(_BatchEchoView, {'batch': json.dumps(batch)})
+        self.assertEqual(response.status_code, 400)
+
+
+class _User(object):
+    is_authenticated = True
+    pk = 1
+
+
+class CoalesceKeyTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_key(self, kwargs=None, **extra):
+        request = self.factory.post('/', {'n': '1'},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+                                    **extra)
+        request.user = _User()
+        view = _CoalescingView()
+        view.setup(request, **(kwargs or {}))
+        view._n = 1
+        return view.get_coalesce_key(request)
+
+    def test_same_request(self):
+        self.assertEqual(self.get_key({'pk': 1}), self.get_key({'pk': 1}))
+
+    def test_url_kwargs(self):
+        self.assertNotEqual(self.get_key({'pk': 1}), self.get_key({'pk': 2}))
+
+    def test_accepted_coding(self):
+        self.assertNotEqual(self.get_key(HTTP_ACCEPT_ENCODING='gzip'),
+                            self.get_key())
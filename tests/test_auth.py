@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from django.test import TestCase
+
+from juice.auth import SessionUserCache
+
+from .models import Note
+
+
+class SessionUserCacheTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.cache = SessionUserCache()
+        self.user = User.objects.create_user('alice', password='secret')
+        engine = import_module(settings.SESSION_ENGINE)
+        self.session_store = engine.SessionStore
+
+    def request(self, session_key=None):
+        request = self.factory.get('/')
+        if session_key is not None:
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+        request.session = self.session_store(session_key)
+        request.user = auth.get_user(request)
+        return request
+
+    def logged_in_session_key(self):
+        request = self.request()
+        auth.login(request, self.user)
+        request.session.save()
+        return request.session.session_key
+
+    def cached_request(self, session_key):
+        self.cache.prime(self.request(session_key))
+        request = self.request(session_key)
+        self.cache.prime(request)
+        self.assertEqual(self.cache.hits, 1)
+        return request
+
+    def test_cached_user_is_a_user(self):
+        request = self.cached_request(self.logged_in_session_key())
+
+        self.assertIsInstance(request.user, User)
+        note = Note(owner=request.user, text='note')
+        note.save()
+        self.assertEqual(Note.objects.get().owner_id, self.user.pk)
+
+    def test_logout_drops_session_entry(self):
+        session_key = self.logged_in_session_key()
+        self.cached_request(session_key)
+
+        auth.logout(self.request(session_key))
+
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_login_drops_previous_session_entry(self):
+        session_key = self.logged_in_session_key()
+        self.cached_request(session_key)
+
+        request = self.request(session_key)
+        auth.login(request, User.objects.create_user('bob'))
+
+        self.assertNotEqual(request.session.session_key, session_key)
+        self.assertEqual(self.cache.stats()['size'], 0)
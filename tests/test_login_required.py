@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import SimpleTestCase
+from django.views.generic import View
+
+from juice.views import flatten_dispatch
+from juice.views.mixins import ConcurrencyLimitMixin
+from juice.views.mixins import ConditionalResponseMixin
+from juice.views.mixins import EnsureCsrfCookieMixin
+from juice.views.mixins import LoginRequiredMixin
+from juice.views.mixins import QueryBudgetMixin
+from juice.views.mixins import TimingMixin
+
+
+class _User(object):
+    pk = 1
+    is_authenticated = True
+    is_active = True
+
+
+class _ProtectedView(LoginRequiredMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse('protected')
+
+
+# Mixins which define `_dispatch_decorator` and are placed before
+# `LoginRequiredMixin`; its own decorator must still be applied.
+_DECORATOR_MIXINS = [
+    (EnsureCsrfCookieMixin, {}),
+    (TimingMixin, {}),
+    (QueryBudgetMixin, {}),
+    (ConditionalResponseMixin, {}),
+    (ConcurrencyLimitMixin, {'concurrency_limit': 10}),
+]
+
+
+class LoginRequiredMixinTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, view_class, user):
+        request = self.factory.get('/protected/')
+        request.user = user
+        return view_class.as_view()(request)
+
+    def view_classes(self):
+        yield _ProtectedView
+        for mixin, attrs in _DECORATOR_MIXINS:
+            name = mixin.__name__ + 'ProtectedView'
+            view_class = type(str(name), (mixin, _ProtectedView), attrs)
+            yield view_class
+            yield flatten_dispatch(type(str('Flat' + name), (view_class,),
+                                        {}))
+
+    def test_anonymous_user_is_redirected(self):
+        for view_class in self.view_classes():
+            response = self.get(view_class, AnonymousUser())
+            self.assertEqual(response.status_code, 302, view_class)
+            self.assertEqual(response['Location'],
+                             '/login/?next=/protected/')
+
+    def test_authenticated_user_gets_view(self):
+        for view_class in self.view_classes():
+            response = self.get(view_class, _User())
+            self.assertEqual(response.status_code, 200, view_class)
+            self.assertEqual(response.content, b'protected')
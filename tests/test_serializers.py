@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import override_settings
+
+from juice import serializers
+from juice.serializers import get_serializer
+
+from .models import Note
+
+
+class GetSerializerTest(TestCase):
+
+    def setUp(self):
+        serializers._serializers.clear()
+        owner = User.objects.create_user('alice')
+        Note.objects.create(owner=owner, text='hi')
+
+    def test_field_order(self):
+        fields = ['text', ('owner', 'owner__username'), 'id']
+        rows = get_serializer(Note, fields).serialize(Note.objects.all())
+        self.assertEqual(list(rows[0]), ['text', 'owner', 'id'])
+
+        rows = get_serializer(Note, fields[::-1]).serialize(Note.objects.all())
+        self.assertEqual(list(rows[0]), ['id', 'owner', 'text'])
+        self.assertEqual(rows[0]['owner'], 'alice')
+        self.assertEqual(len(serializers._serializers), 1)
+
+    @override_settings(JUICE_SERIALIZER_CACHE_SIZE=2)
+    def test_cache_size(self):
+        for fields in (['id'], ['text'], ['id', 'text'], ['text']):
+            get_serializer(Note, fields)
+        self.assertEqual(
+            list(serializers._serializers),
+            [(Note, frozenset(['id', 'text'])), (Note, frozenset(['text']))])